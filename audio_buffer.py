@@ -0,0 +1,73 @@
+# audio_buffer.py
+
+import threading
+import numpy as np
+
+INT16_SCALE = 1 / 32768
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity int16 audio buffer addressed by absolute sample index.
+
+    Every sample is stored twice (at i and i + capacity), so any window of
+    up to `capacity` samples is a contiguous slice, even when it wraps
+    around the end of the ring.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=np.int16)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.start = 0          # oldest retained absolute sample index
+            self.end = 0            # one past the newest absolute sample index
+            self.overwritten = 0    # samples lost because the ring was full
+
+    def __len__(self):
+        return self.end - self.start
+
+    def write(self, samples):
+        """Append int16 samples, overwriting the oldest ones when full."""
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        # Only the newest `capacity` samples are kept, but all of them count
+        # towards the absolute indices
+        skipped = max(0, len(samples) - self.capacity)
+        samples = samples[skipped:]
+        n = len(samples)
+        if n == 0:
+            return
+        with self._lock:
+            self.end += skipped
+            pos = self.end % self.capacity
+            first = min(n, self.capacity - pos)
+            for offset in (0, self.capacity):
+                self._data[offset + pos:offset + pos + first] = samples[:first]
+            if first < n:
+                rest = n - first
+                self._data[:rest] = samples[first:]
+                self._data[self.capacity:self.capacity + rest] = samples[first:]
+            self.end += n
+            if self.end - self.start > self.capacity:
+                self.overwritten += self.end - self.capacity - self.start
+                self.start = self.end - self.capacity
+
+    def _clamp(self, start, end):
+        start = self.start if start is None else max(start, self.start)
+        end = self.end if end is None else min(end, self.end)
+        return start, max(start, end)
+
+    def float_window(self, start=None, end=None):
+        """Return [start, end) as a new float32 array in [-1, 1)."""
+        with self._lock:
+            start, end = self._clamp(start, end)
+            pos = start % self.capacity
+            window = self._data[pos:pos + end - start].astype(np.float32)
+        window *= INT16_SCALE
+        return window
+
+    def discard_until(self, index):
+        """Drop samples before the absolute index `index`."""
+        with self._lock:
+            self.start = max(self.start, min(index, self.end))
@@ -0,0 +1,275 @@
+# batch_transcribe.py
+#
+# Batch transcription of voice memos and recordings with the same STT stack
+# as the live assistant:
+#
+#   python -m stt_module transcribe DIR [--output OUT] [--workers N]
+#
+# Files are decoded as a stream (WAV natively, anything else through
+# ffmpeg), cut into segments at pauses and transcribed segment by segment,
+# so memory stays flat for hours-long meetings. Files are spread over a
+# process pool with one model per worker and disjoint CPU sets. Segments
+# are appended to <name>.jsonl as they are decoded, so an interrupted run
+# resumes where it stopped; <name>.srt is written when a file is complete.
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import config
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 1.0
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.m4a', '.flac', '.ogg', '.opus', '.webm', '.mp4', '.aac', '.wma'}
+MANIFEST = "manifest.jsonl"
+
+# ---------------------------- Audio Input ----------------------------
+
+def read_audio_chunks(path, start_seconds=0.0, chunk_seconds=CHUNK_SECONDS):
+    """Yield 16 kHz mono int16 chunks of a file, starting at `start_seconds`."""
+    chunk_samples = int(chunk_seconds * SAMPLE_RATE)
+    if path.lower().endswith('.wav'):
+        with wave.open(path, 'rb') as f:
+            if (f.getframerate(), f.getnchannels(), f.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+                f.setpos(min(int(start_seconds * SAMPLE_RATE), f.getnframes()))
+                while True:
+                    data = f.readframes(chunk_samples)
+                    if not data:
+                        return
+                    yield np.frombuffer(data, dtype=np.int16)
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError(f"{path}: ffmpeg is needed for anything but 16 kHz mono 16-bit WAV")
+    process = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-ss", str(start_seconds), "-i", path,
+         "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+        stdout=subprocess.PIPE
+    )
+    try:
+        while True:
+            data = process.stdout.read(chunk_samples * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+    finally:
+        process.kill()
+        process.wait()
+
+# ---------------------------- Outputs ----------------------------
+
+def output_paths(path, root, output_dir):
+    base = os.path.join(output_dir, os.path.splitext(os.path.relpath(path, root))[0])
+    return base + '.jsonl', base + '.srt'
+
+def resume_point(jsonl_path):
+    """Seconds of the file already transcribed by an earlier run."""
+    position = 0.0
+    try:
+        with open(jsonl_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    position = max(position, json.loads(line)["chunk_end"])
+                except (ValueError, KeyError):
+                    break  # a line cut short by the interruption
+    except FileNotFoundError:
+        pass
+    return position
+
+def srt_time(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
+
+def write_srt(jsonl_path, srt_path):
+    with open(jsonl_path, encoding='utf-8') as f:
+        segments = [json.loads(line) for line in f if line.strip()]
+    with open(srt_path, 'w', encoding='utf-8') as f:
+        for index, segment in enumerate((s for s in segments if s["text"]), 1):
+            f.write(f"{index}\n{srt_time(segment['start'])} --> {srt_time(segment['end'])}\n{segment['text']}\n\n")
+
+def read_manifest(output_dir):
+    done = {}
+    try:
+        with open(os.path.join(output_dir, MANIFEST), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[entry["file"]] = entry
+    except FileNotFoundError:
+        pass
+    return done
+
+# ---------------------------- Workers ----------------------------
+
+def init_worker(cpu_sets, threads, model, device):
+    """Pin the worker to its own CPUs and configure its model."""
+    cpus = cpu_sets.get()
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    config.WHISPER_CPU_THREADS = threads
+    config.WHISPER_WARMUP = False
+    config.WHISPER_DEVICE = device
+    if model:
+        config.WHISPER_MODEL = model
+
+def transcribe_file(path, jsonl_path, srt_path, formats):
+    """Transcribe one file (resuming a partial run) and return its statistics."""
+    import stt_module
+    from audio_buffer import AudioRingBuffer
+    from vad import EnergyVAD, StreamingVAD, PauseSegmenter
+
+    stt_module.get_model()
+    start_time = time.perf_counter()
+    offset = resume_point(jsonl_path)
+    buffer = AudioRingBuffer(int((stt_module.SEGMENT_MAX_LENGTH + 10) * SAMPLE_RATE))
+    voice = StreamingVAD(EnergyVAD(frame_size=stt_module.SAMPLE_SIZE), sample_rate=SAMPLE_RATE,
+                         speech_pad=stt_module.SPEECH_PAD)
+    segmenter = PauseSegmenter(
+        sample_rate=SAMPLE_RATE,
+        frame_size=stt_module.SAMPLE_SIZE,
+        min_pause=stt_module.SEGMENT_MIN_PAUSE,
+        min_segment=stt_module.SEGMENT_MIN_LENGTH,
+        max_segment=stt_module.SEGMENT_MAX_LENGTH
+    )
+    state = {"start": 0, "previous": ''}
+
+    os.makedirs(os.path.dirname(jsonl_path) or '.', exist_ok=True)
+    with open(jsonl_path, 'a', encoding='utf-8') as out:
+        def close_segment(end, had_speech):
+            # Positions are relative to `offset`, where this run started
+            segments = []
+            if had_speech and end > state["start"]:
+                window = buffer.float_window(state["start"], end)
+                segments = stt_module.transcribe_segments(window, state["previous"][-stt_module.STREAM_PROMPT_CHARS:])
+            chunk_start = offset + state["start"] / SAMPLE_RATE
+            chunk_end = offset + end / SAMPLE_RATE
+            lines = []
+            for start, stop, text in segments:
+                lines.append({"start": round(chunk_start + start, 3), "end": round(chunk_start + stop, 3),
+                              "text": text, "chunk_end": round(chunk_end, 3)})
+                state["previous"] += ' ' + text
+            if not segments:
+                # Records progress through silence as well, for resuming
+                lines.append({"start": round(chunk_start, 3), "end": round(chunk_end, 3),
+                              "text": '', "chunk_end": round(chunk_end, 3)})
+            out.write(''.join(json.dumps(line) + '\n' for line in lines))  # one write per segment
+            out.flush()
+            state["start"] = end
+            buffer.discard_until(end)
+            voice.discard_until(end)
+
+        for chunk in read_audio_chunks(path, offset):
+            buffer.write(chunk)
+            for boundary, had_speech in segmenter.process(voice.process(chunk)):
+                close_segment(boundary, had_speech)
+        if buffer.end > state["start"]:
+            close_segment(buffer.end, had_speech=bool(voice.speech_regions(state["start"], buffer.end)))
+
+    if "srt" in formats:
+        write_srt(jsonl_path, srt_path)
+    return {
+        "file": path,
+        "audio_s": round(offset + buffer.end / SAMPLE_RATE, 3),
+        "decoded_s": round(buffer.end / SAMPLE_RATE, 3),
+        "wall_s": round(time.perf_counter() - start_time, 3),
+    }
+
+def cpu_partition(workers):
+    """Split the usable CPUs into one disjoint set per worker."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cpus) // workers)
+    return [set(cpus[i * per_worker:(i + 1) * per_worker]) or set(cpus) for i in range(workers)], per_worker
+
+def find_audio_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in sorted(names)
+                             if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS)
+        else:
+            files.append(path)
+    return files
+
+# ---------------------------- Command Line ----------------------------
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m stt_module", description="Speech-to-text tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    transcribe = commands.add_parser("transcribe", help="transcribe audio files in parallel")
+    transcribe.add_argument("inputs", nargs='+', help="audio files or directories (searched recursively)")
+    transcribe.add_argument("--output", help="output directory (default: <first input>/transcripts)")
+    transcribe.add_argument("--format", default="jsonl,srt", help="comma-separated: jsonl, srt")
+    transcribe.add_argument("--workers", type=int, help="worker processes (default: one per 4 CPUs)")
+    transcribe.add_argument("--model", help=f"Whisper model (default: {config.WHISPER_MODEL})")
+    transcribe.add_argument("--device", default="cpu", help="cpu, cuda or auto")
+    args = parser.parse_args()
+
+    files = find_audio_files(args.inputs)
+    if not files:
+        parser.error("no audio files found")
+    root = args.inputs[0] if os.path.isdir(args.inputs[0]) else os.path.dirname(os.path.abspath(args.inputs[0]))
+    output_dir = args.output or os.path.join(root, "transcripts")
+    os.makedirs(output_dir, exist_ok=True)
+    formats = set(args.format.split(','))
+
+    done = read_manifest(output_dir)
+    pending = [path for path in files if os.path.abspath(path) not in done]
+    if len(pending) < len(files):
+        print(f"Skipping {len(files) - len(pending)} files finished by an earlier run.")
+    if not pending:
+        return
+
+    usable_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    workers = args.workers or max(1, usable_cpus // 4)
+    workers = min(workers, len(pending))
+    cpu_sets, threads = cpu_partition(workers)
+    context = multiprocessing.get_context("spawn")  # CTranslate2 does not survive fork
+    assignments = context.Queue()
+    for cpus in cpu_sets:
+        assignments.put(cpus)
+    print(f"Transcribing {len(pending)} files with {workers} workers x {threads} threads...")
+
+    start = time.perf_counter()
+    audio_total = 0.0
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(assignments, threads, args.model, args.device)) as executor, \
+            open(os.path.join(output_dir, MANIFEST), 'a', encoding='utf-8') as manifest:
+        futures = {}
+        for path in pending:
+            jsonl_path, srt_path = output_paths(path, root, output_dir)
+            futures[executor.submit(transcribe_file, path, jsonl_path, srt_path, formats)] = path
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(f"[ERROR] {path}: {e}")
+                    continue
+                stats["file"] = os.path.abspath(path)
+                manifest.write(json.dumps(stats) + '\n')
+                manifest.flush()
+                audio_total += stats["decoded_s"]
+                speed = stats["decoded_s"] / stats["wall_s"] if stats["wall_s"] else 0
+                print(f"{path}: {stats['audio_s'] / 60:.1f} min of audio, {speed:.1f}x real time")
+        except KeyboardInterrupt:
+            print("\nInterrupted; run the same command again to resume.")
+            executor.shutdown(wait=False, cancel_futures=True)
+            sys.exit(130)
+
+    wall = time.perf_counter() - start
+    print(f"\n{len(pending) - failures} files, {audio_total / 3600:.2f} audio hours in {wall / 3600:.3f} wall hours: "
+          f"{audio_total / wall if wall else 0:.1f} audio-hours per wall-hour")
@@ -0,0 +1,228 @@
+# bench_e2e.py
+#
+# Offline end-to-end benchmark: replays WAV files through the real
+# recording/transcription pipeline (a fake PyAudio stream feeds the capture
+# callback) and sends the final transcript to a stub LLM server. Reports
+# transcript update latency, real-time factor, stop-to-answer latency,
+# CPU time, peak RSS and the word error rate against <name>.txt references.
+# CPU-only with a tiny model by default, so it runs on CI machines.
+#
+#   python benchmarks/bench_e2e.py samples/ --speed 2 --json results.json
+
+import argparse
+import glob
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import fake_pyaudio
+sys.modules['pyaudio'] = fake_pyaudio  # before stt_module imports it
+
+import config
+from llm_cache import normalize_query
+from stub_llm_server import StubLLM, start_server, base_url
+
+
+def load_wav(path):
+    """Interleaved int16 samples, sample rate and channel count of a 16-bit PCM WAV file."""
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        rate, channels = f.getframerate(), f.getnchannels()
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    return samples, rate, channels
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref, hyp = normalize_query(reference).split(), normalize_query(hypothesis).split()
+    if not ref:
+        return float(bool(hyp))
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(np.ceil(p / 100 * len(values))) - 1))]
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def watch_transcripts(updates):
+    """Transcript listener recording (time, text) of every update the window would show."""
+    def listener(text):
+        if not updates or updates[-1][1] != text:
+            updates.append((time.perf_counter(), text))
+    return listener
+
+def run_file(stt_module, llm_module, path, reference, args):
+    # The fake device plays the file in its own format, so the capture path
+    # downmixes and resamples it like a real 44.1/48 kHz or stereo microphone
+    samples, rate, channels = load_wav(path)
+    audio_s = len(samples) / channels / rate
+    fake_pyaudio.source = samples
+    fake_pyaudio.device_rate = rate
+    fake_pyaudio.device_channels = channels
+    fake_pyaudio.speed = args.speed
+
+    updates = []
+    listener = watch_transcripts(updates)
+    stt_module.transcript_listeners.append(listener)
+    stt_module.tracer.trace_id = os.path.basename(path)
+
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    stt_module.start_record_and_transcription()
+    while fake_pyaudio.PyAudio.last_stream is None or not fake_pyaudio.PyAudio.last_stream.source_done.is_set():
+        time.sleep(0.01)
+    time.sleep(args.tail / args.speed)
+    first_chunk = fake_pyaudio.PyAudio.last_stream.chunk_times[0][0]
+
+    stop_time = time.perf_counter()
+    stt_module.stop_record_and_transcription()
+    transcript = stt_module.final_transcription_text
+    transcript_time = time.perf_counter()
+    fake_pyaudio.PyAudio.last_stream = None
+
+    llm_module.reset_history("You are a benchmark assistant.")
+    answer = ''.join(llm_module.stream_response(transcript))
+    answer_time = time.perf_counter()
+    stt_module.transcript_listeners.remove(listener)
+
+    partial_updates = [t for t, text in updates if t < stop_time and text.strip()]
+    intervals = [b - a for a, b in zip(partial_updates, partial_updates[1:])]
+    return {
+        "file": os.path.basename(path),
+        "audio_s": round(audio_s, 2),
+        "first_update_s": round(partial_updates[0] - first_chunk, 3) if partial_updates else None,
+        "updates": len(partial_updates),
+        "update_interval_p50_s": percentile(intervals, 50),
+        "update_interval_p95_s": percentile(intervals, 95),
+        "stop_to_transcript_s": round(transcript_time - stop_time, 3),
+        "stop_to_answer_s": round(answer_time - stop_time, 3),
+        "llm_first_token_s": llm_module.last_response_timings.get('first_token'),
+        "cpu_s": round(cpu_seconds() - cpu_start, 2),
+        "cpu_util": round((cpu_seconds() - cpu_start) / (answer_time - wall_start), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "wer": round(word_error_rate(reference, transcript), 3) if reference is not None else None,
+        "transcript": transcript,
+        "answer": answer,
+    }
+
+DECODE_STAGES = ("stt.partial_pass", "stt.segment_pass", "stt.final_tail", "stt.full_pass")
+
+def add_decode_times(results, trace_path):
+    """Whisper decode time per file (from the trace spans) and its real-time factor."""
+    decode_ms = {}
+    with open(trace_path, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["stage"] in DECODE_STAGES:
+                decode_ms[entry["trace"]] = decode_ms.get(entry["trace"], 0.0) + entry["ms"]
+    for result in results:
+        decode_s = decode_ms.get(result["file"], 0.0) / 1000
+        result["decode_s"] = round(decode_s, 3)
+        result["rtf"] = round(decode_s / result["audio_s"], 3) if result["audio_s"] else None
+
+def find_inputs(paths):
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.wav'))) if os.path.isdir(path) else [path])
+    inputs = []
+    for wav in files:
+        reference_path = os.path.splitext(wav)[0] + '.txt'
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding='utf-8') as f:
+                reference = f.read().strip()
+        inputs.append((wav, reference))
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end voice pipeline benchmark")
+    parser.add_argument("inputs", nargs='+', help="WAV files or directories (references in <name>.txt)")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed, 1 = real time")
+    parser.add_argument("--tail", type=float, default=0.5, help="seconds of silence before the stop hotkey")
+    parser.add_argument("--model", default="tiny.en", help="Whisper model for both tiers")
+    parser.add_argument("--partial-model", help="Whisper model for live passes (default: --model)")
+    parser.add_argument("--llm-first-token-ms", type=float, default=200.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--llm-answer", default="ls -la")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        parser.error("no WAV files found")
+
+    config.WHISPER_MODEL = args.model
+    config.WHISPER_PARTIAL_MODEL = args.partial_model or args.model
+    config.WHISPER_DEVICE = "cpu"
+    config.WHISPER_COMPUTE_TYPE = "int8"
+    config.LLM_SPECULATIVE = False
+    trace_dir = tempfile.mkdtemp(prefix="bench-e2e-")
+
+    import stt_module
+    import llm_module
+    import tracing
+    from llm_pool import EndpointPool
+
+    tracing.tracer.path = os.path.join(trace_dir, "traces.jsonl")
+    tracing.tracer.enabled = True
+    server = start_server(StubLLM(mode="openai", first_token_ms=args.llm_first_token_ms,
+                                  tokens_per_second=args.llm_tokens_per_second, answer=args.llm_answer))
+    llm_module.pool = EndpointPool([base_url(server)], config.LLM_API_KEY)
+
+    load_start = time.perf_counter()
+    stt_module.load_model(stt_module.PARTIAL_TIER)
+    stt_module.load_model(stt_module.FINAL_TIER)
+    print(f"Models loaded in {time.perf_counter() - load_start:.2f}s, peak RSS {peak_rss_mb():.0f} MB")
+    # One untimed request, so the first file's LLM times do not include the
+    # openai import, client creation and connection setup
+    llm_module.probe_endpoints()
+    llm_module.reset_history("You are a benchmark assistant.")
+    ''.join(llm_module.stream_response("warm-up"))
+
+    results = [run_file(stt_module, llm_module, path, reference, args) for path, reference in inputs]
+    tracing.tracer.close()
+    add_decode_times(results, tracing.tracer.path)
+
+    columns = ["file", "audio_s", "first_update_s", "update_interval_p50_s", "stop_to_transcript_s",
+               "stop_to_answer_s", "rtf", "cpu_util", "peak_rss_mb", "wer"]
+    print('\n' + '  '.join(f"{c:>14}" for c in columns))
+    for result in results:
+        print('  '.join(f"{'-' if result[c] is None else result[c]:>14}" for c in columns))
+    wers = [r["wer"] for r in results if r["wer"] is not None]
+    if wers:
+        print(f"\nmean WER: {np.mean(wers):.3f}")
+    stops = [r["stop_to_answer_s"] for r in results]
+    print(f"stop to answer: p50 {percentile(stops, 50):.3f}s, p95 {percentile(stops, 95):.3f}s")
+
+    print("\nPer-stage latency:")
+    tracing.print_summary(tracing.summarize(tracing.trace_files(tracing.tracer.path)))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# bench_endpoint_pool.py
+#
+# Time to first token through the endpoint pool against stub servers whose
+# requests occasionally stall (a busy box), with hedging off and on, plus a
+# failover run where the preferred endpoint is down.
+#
+#   python benchmarks/bench_endpoint_pool.py --requests 100
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from llm_pool import EndpointPool, LatencyHistogram
+from stub_llm_server import StubLLM, start_server, base_url
+
+REQUEST = dict(model="stub", messages=[{"role": "user", "content": "List files"}], max_tokens=16)
+
+def stub_urls(count, args):
+    return [base_url(start_server(StubLLM(mode="openai", first_token_ms=args.first_token_ms,
+                                          tail_rate=args.tail_rate, tail_ms=args.tail_ms, seed=i)))
+            for i in range(count)]
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+def run(label, pool, requests):
+    histogram = LatencyHistogram()
+    errors = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            for chunk in pool.stream(REQUEST):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    histogram.record(time.perf_counter() - start)
+                    break
+        except Exception:
+            errors += 1
+    print(f"{label:<28} {histogram.summary()}, errors={errors}, stats={pool.stats}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint pool hedging/failover benchmark")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--first-token-ms", type=float, default=30.0)
+    parser.add_argument("--tail-rate", type=float, default=0.1)
+    parser.add_argument("--tail-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    config.LLM_PROMPT_CACHE = False
+    config.LLM_HEDGE_MIN_SAMPLES = 5
+    config.LLM_HEDGE_DEFAULT_DELAY = 0.2
+
+    config.LLM_HEDGE = False
+    run("2 endpoints, no hedging", EndpointPool(stub_urls(2, args), config.LLM_API_KEY), args.requests)
+    config.LLM_HEDGE = True
+    run("2 endpoints, hedged", EndpointPool(stub_urls(2, args), config.LLM_API_KEY), args.requests)
+    run("first endpoint down", EndpointPool([closed_port_url()] + stub_urls(1, args), config.LLM_API_KEY),
+        args.requests)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# bench_prompt_cache.py
+#
+# Measures how much prompt processing llama.cpp's prompt cache saves for a
+# multi-turn conversation. Runs against the stub server by default; pass
+# --url to point it at a real llama.cpp server instead.
+#
+#   python benchmarks/bench_prompt_cache.py --turns 8
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import llm_module
+from llm_pool import EndpointPool
+from stub_llm_server import StubLLM, start_server, base_url
+
+SYSTEM_PROMPT = ("You are a voice assistant for a Linux desktop. Answer with a single shell "
+                 "command or a short sentence, without explanations or code fences. ") * 20
+
+QUERIES = [
+    "List files in the current directory",
+    "Show disk usage",
+    "Find large files in my home directory",
+    "Show running processes",
+    "Check the IP address",
+    "Show the kernel version",
+    "Count lines in all python files",
+    "Show the git log of the last week",
+]
+
+def run(url, prompt_cache, turns):
+    config.LLM_PROMPT_CACHE = prompt_cache
+    llm_module.pool = EndpointPool([url], config.LLM_API_KEY)
+    # One untimed request first, so client setup and the connection are not
+    # measured. It shares no prefix with SYSTEM_PROMPT, so the cache stays cold.
+    llm_module.reset_history("Warm-up.")
+    llm_module.get_response("Say OK.")
+    llm_module.reset_history(SYSTEM_PROMPT)
+
+    rows = []
+    for i in range(turns):
+        start = time.perf_counter()
+        llm_module.get_response(QUERIES[i % len(QUERIES)])
+        elapsed = time.perf_counter() - start
+        timings = dict(llm_module.last_response_timings)
+        rows.append((timings.get('prompt_tokens'), timings.get('prompt_ms'), elapsed))
+    return rows
+
+def report(label, rows):
+    print(f"\n{label}")
+    print(f"{'turn':>4} {'prompt tokens':>14} {'prompt ms':>10} {'request s':>10}")
+    for i, (tokens, prompt_ms, elapsed) in enumerate(rows):
+        tokens = '-' if tokens is None else tokens
+        prompt_ms = '-' if prompt_ms is None else f"{prompt_ms:.0f}"
+        print(f"{i + 1:>4} {tokens:>14} {prompt_ms:>10} {elapsed:>10.3f}")
+    total = sum(elapsed for _, _, elapsed in rows)
+    print(f"total request time: {total:.3f}s")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt-cache reuse benchmark")
+    parser.add_argument("--url", help="OpenAI-compatible base URL (default: in-process stub server)")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--prompt-ms-per-token", type=float, default=0.5,
+                        help="stub server prompt processing cost")
+    args = parser.parse_args()
+
+    def server_url():
+        # A fresh stub server per run so the second run starts with a cold cache
+        if args.url:
+            return args.url
+        return base_url(start_server(StubLLM(prompt_ms_per_token=args.prompt_ms_per_token)))
+
+    without = report("cache_prompt off", run(server_url(), False, args.turns))
+    with_cache = report("cache_prompt on, pinned slot", run(server_url(), True, args.turns))
+    print(f"\nspeedup: {without / with_cache:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench_resampler.py
+#
+# CPU cost of converting microphone audio to 16 kHz mono with the streaming
+# polyphase resampler, fed in device-sized chunks (one 32 ms capture chunk
+# at a time, as in stt_module). Also checks that chunked output matches one
+# call over the whole signal, and reports the attenuation of an 11 kHz tone
+# that would alias into the speech band.
+#
+#   python benchmarks/bench_resampler.py --seconds 60
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from resampler import StreamingResampler
+
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 512  # stt_module.SAMPLE_SIZE
+FORMATS = [(48000, 1), (48000, 2), (44100, 1), (44100, 2), (32000, 1), (22050, 1), (8000, 1), (16000, 2)]
+
+def test_signal(rate, channels, seconds, seed=0):
+    """Interleaved int16 speech-band noise plus a tone."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    mono = 3000 * np.sin(2 * np.pi * 440 * t) + rng.normal(0, 1500, len(t))
+    return np.repeat(np.clip(mono, -32768, 32767).astype(np.int16), channels)
+
+def alias_attenuation_db(rate, width):
+    """Level of an 11 kHz tone after conversion, relative to its input level."""
+    if rate <= 22000:
+        return None
+    tone = (8000 * np.sin(2 * np.pi * 11000 * np.arange(rate) / rate)).astype(np.int16)
+    output = StreamingResampler(rate, SAMPLE_RATE, width=width).process(tone)[200:].astype(np.float64)
+    return 20 * np.log10(max(output.std(), 1e-9) / tone.std())
+
+def run(rate, channels, seconds, width):
+    samples = test_signal(rate, channels, seconds)
+    chunk = round(CHUNK_SAMPLES * rate / SAMPLE_RATE) * channels
+    resampler = StreamingResampler(rate, SAMPLE_RATE, channels, width=width)
+    chunk_times, outputs = [], []
+    cpu_start = time.process_time()
+    for start in range(0, len(samples), chunk):
+        t0 = time.perf_counter()
+        outputs.append(resampler.process(samples[start:start + chunk]))
+        chunk_times.append(time.perf_counter() - t0)
+    cpu = time.process_time() - cpu_start
+    chunked = np.concatenate(outputs)
+    whole = StreamingResampler(rate, SAMPLE_RATE, channels, width=width).process(samples)
+    return {
+        "format": f"{rate} Hz x {channels}",
+        "cpu_ms_per_audio_s": cpu * 1000 / seconds,
+        "chunk_p50_us": np.percentile(chunk_times, 50) * 1e6,
+        "chunk_p99_us": np.percentile(chunk_times, 99) * 1e6,
+        "output_samples": len(chunked),
+        "expected_samples": round(len(samples) / channels * SAMPLE_RATE / rate),
+        "chunked_equals_whole": bool(np.array_equal(chunked, whole)),
+        "alias_db": alias_attenuation_db(rate, width),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming resampler microbenchmark")
+    parser.add_argument("--seconds", type=float, default=60.0, help="audio seconds per format")
+    parser.add_argument("--width", type=int, default=24, help="filter length in samples at the lower rate")
+    args = parser.parse_args()
+
+    print(f"{'format':>16} {'CPU ms/audio s':>15} {'chunk p50 us':>13} {'chunk p99 us':>13} "
+          f"{'samples':>9} {'chunked=whole':>14} {'11 kHz alias':>13}")
+    for rate, channels in FORMATS:
+        r = run(rate, channels, args.seconds, args.width)
+        alias = '-' if r["alias_db"] is None else f"{r['alias_db']:.1f} dB"
+        print(f"{r['format']:>16} {r['cpu_ms_per_audio_s']:>15.2f} {r['chunk_p50_us']:>13.1f} "
+              f"{r['chunk_p99_us']:>13.1f} {r['output_samples']:>9} {str(r['chunked_equals_whole']):>14} "
+              f"{alias:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# fake_pyaudio.py
+#
+# Stand-in for the parts of PyAudio used by stt_module. Input streams play
+# back an int16 sample array through the stream callback at real-time (or
+# `speed` times faster) pace, then keep delivering silence like an idle
+# microphone until closed. Benchmarks install it as the `pyaudio` module:
+#
+#   sys.modules['pyaudio'] = fake_pyaudio
+
+import threading
+import time
+import numpy as np
+
+paInt16 = 8
+paContinue = 0
+paComplete = 1
+paInputOverflow = 2
+
+# Samples the next opened stream plays (interleaved for several channels),
+# and its playback speed
+source = np.zeros(0, dtype=np.int16)
+speed = 1.0
+# Native format the fake input device reports
+device_rate = 16000
+device_channels = 1
+
+class FakeStream:
+    def __init__(self, samples, rate, channels, frames_per_buffer, callback, speed):
+        self.samples = samples
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.callback = callback
+        self.speed = speed
+        self.position = 0           # frames delivered so far
+        self.source_done = threading.Event()
+        self.chunk_times = []       # (wall time, samples delivered) per callback
+        self._active = True
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fake-pyaudio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        interval = self.frames_per_buffer / self.rate / self.speed
+        next_time = time.perf_counter()
+        chunk_samples = self.frames_per_buffer * self.channels
+        silence = np.zeros(chunk_samples, dtype=np.int16)
+        while not self._stopped.is_set():
+            start = self.position * self.channels
+            chunk = self.samples[start:start + chunk_samples]
+            if len(chunk) < chunk_samples:
+                chunk = np.concatenate([chunk, silence[:chunk_samples - len(chunk)]])
+            self.position += self.frames_per_buffer
+            self.chunk_times.append((time.perf_counter(), self.position))
+            self.callback(chunk.tobytes(), self.frames_per_buffer, {}, 0)
+            if self.position * self.channels >= len(self.samples):
+                self.source_done.set()
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                self._stopped.wait(delay)
+
+    def is_active(self):
+        return self._active
+
+    def stop_stream(self):
+        self._active = False
+        self._stopped.set()
+        self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+class PyAudio:
+    last_stream = None
+
+    def open(self, format=paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024,
+             stream_callback=None, **kwargs):
+        stream = FakeStream(source, rate, channels, frames_per_buffer, stream_callback, speed)
+        PyAudio.last_stream = stream
+        return stream
+
+    def get_default_input_device_info(self):
+        return {'index': 0, 'defaultSampleRate': float(device_rate), 'maxInputChannels': device_channels}
+
+    def get_device_info_by_index(self, index):
+        return self.get_default_input_device_info()
+
+    def terminate(self):
+        pass
@@ -0,0 +1,182 @@
+# stub_llm_server.py
+#
+# Minimal OpenAI-compatible chat server for benchmarks. It simulates
+# prompt-processing and generation time and, in llama.cpp mode, the
+# server's per-slot prompt cache (cache_prompt / id_slot) and /props.
+#
+#   python benchmarks/stub_llm_server.py --port 8081 --mode llama.cpp
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+
+def tokenize(messages):
+    """Fake tokenizer: fixed-size character chunks of the serialized prompt."""
+    text = ''.join(f"<|{m['role']}|>{m['content']}" for m in messages)
+    return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+class StubLLM:
+    def __init__(self, mode="llama.cpp", prompt_ms_per_token=0.5, tokens_per_second=50.0,
+                 first_token_ms=20.0, answer="ls -la", slots=4, tail_rate=0.0, tail_ms=0.0, seed=None):
+        self.mode = mode
+        self.prompt_ms_per_token = prompt_ms_per_token
+        self.tokens_per_second = tokens_per_second
+        self.first_token_ms = first_token_ms
+        self.answer = answer
+        # A `tail_rate` fraction of requests is delayed by `tail_ms` (a busy server)
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.random = random.Random(seed)
+        self.slots = [[] for _ in range(slots)]  # cached prompt tokens per slot
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def prompt_eval(self, body):
+        """Tokens to evaluate for this request after prompt-cache reuse."""
+        tokens = tokenize(body.get("messages", []))
+        cache = self.mode == "llama.cpp" and body.get("cache_prompt", False)
+        with self.lock:
+            self.requests += 1
+            slot = body.get("id_slot", -1)
+            if not 0 <= slot < len(self.slots):
+                # Like llama.cpp: pick the slot sharing the longest prefix
+                slot = max(range(len(self.slots)), key=lambda i: common_prefix(self.slots[i], tokens))
+            reused = common_prefix(self.slots[slot], tokens) if cache else 0
+            self.slots[slot] = tokens
+        return len(tokens), len(tokens) - reused
+
+    def extra_delay_ms(self):
+        with self.lock:
+            return self.tail_ms if self.random.random() < self.tail_rate else 0.0
+
+    def answer_tokens(self, body):
+        words = self.answer.split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+def common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+def make_handler(llm):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/props" and llm.mode == "llama.cpp":
+                self.send_json(200, {"default_generation_settings": {}, "total_slots": len(llm.slots)})
+            elif self.path in ("/v1/models", "/models"):
+                self.send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": llm.mode}]})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_json(404, {"error": "not found"})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt_n, evaluated = llm.prompt_eval(body)
+            prompt_ms = evaluated * llm.prompt_ms_per_token
+            time.sleep((prompt_ms + llm.first_token_ms + llm.extra_delay_ms()) / 1000)
+
+            pieces = llm.answer_tokens(body)
+            timings = {"prompt_n": evaluated, "prompt_ms": prompt_ms, "cache_n": prompt_n - evaluated,
+                       "predicted_n": len(pieces)}
+            usage = {"prompt_tokens": prompt_n, "completion_tokens": len(pieces), "total_tokens": prompt_n + len(pieces)}
+            base = {"id": f"chatcmpl-{llm.requests}", "created": int(time.time()), "model": "stub"}
+
+            if not body.get("stream"):
+                time.sleep(len(pieces) / llm.tokens_per_second)
+                payload = dict(base, object="chat.completion", usage=usage, choices=[{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": ''.join(pieces)}
+                }])
+                if llm.mode == "llama.cpp":
+                    payload["timings"] = timings
+                self.send_json(200, payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(1 / llm.tokens_per_second)
+                    self.send_event(dict(base, object="chat.completion.chunk", choices=[{
+                        "index": 0, "finish_reason": None, "delta": {"content": piece}
+                    }]))
+                last = dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "finish_reason": "stop", "delta": {}
+                }])
+                if llm.mode == "llama.cpp":
+                    last["timings"] = timings
+                self.send_event(last)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled the request
+            self.close_connection = True
+
+        def send_event(self, payload):
+            self.wfile.write(b"data: " + json.dumps(payload).encode() + b"\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+def start_server(llm, host="127.0.0.1", port=0):
+    """Serve `llm` on a background thread. Returns the server; its URL is base_url(server)."""
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--mode", choices=["llama.cpp", "openai"], default="llama.cpp")
+    parser.add_argument("--prompt-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-ms", type=float, default=20.0)
+    parser.add_argument("--answer", default="ls -la")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of slow requests")
+    parser.add_argument("--tail-ms", type=float, default=0.0, help="extra delay of slow requests")
+    args = parser.parse_args()
+
+    llm = StubLLM(args.mode, args.prompt_ms_per_token, args.tokens_per_second, args.first_token_ms, args.answer,
+                  tail_rate=args.tail_rate, tail_ms=args.tail_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(llm))
+    print(f"Stub {args.mode} server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# clipboard_context.py
+
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from command_index import content_tokens
+from llm_cache import normalize_query
+
+UNCHANGED_NOTE = "(The clipboard content is the same as in my earlier message.)"
+
+def estimate_tokens(text, chars_per_token):
+    return math.ceil(len(text) / chars_per_token)
+
+def split_chunks(text, max_chars):
+    """Split text into (first line, lines) chunks of whole lines, up to max_chars each."""
+    chunks, lines, size, first = [], [], 0, 0
+    for number, line in enumerate(text.splitlines()):
+        while len(line) > max_chars:  # minified code, long log lines
+            if lines:
+                chunks.append((first, lines))
+                lines, size = [], 0
+            chunks.append((number, [line[:max_chars]]))
+            line = line[max_chars:]
+        if lines and size + len(line) + 1 > max_chars:
+            chunks.append((first, lines))
+            lines, size = [], 0
+        if not lines:
+            first = number
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        chunks.append((first, lines))
+    return chunks
+
+def omission_marker(chunks, start, end):
+    """Marker for the chunks [start, end) left out of the context."""
+    last = chunks[end][0] if end < len(chunks) else chunks[-1][0] + len(chunks[-1][1])
+    lines = last - chunks[start][0]
+    return f"[... {lines} lines omitted ...]" if lines else "[... omitted ...]"
+
+def rank_chunks(chunks, query):
+    """
+    Chunk indices, most relevant to the spoken query first (BM25 over the
+    query's content words). Chunks without any query word follow, later
+    ones first: recent log lines and the end of a file are likelier targets.
+    """
+    terms = content_tokens(query)
+    counts = [Counter(normalize_query('\n'.join(lines)).split()) for _, lines in chunks]
+    lengths = [sum(count.values()) for count in counts]
+    average = (sum(lengths) / len(lengths)) or 1
+    idf = {}
+    for term in terms:
+        documents = sum(1 for count in counts if term in count)
+        idf[term] = math.log(1 + (len(counts) - documents + 0.5) / (documents + 0.5))
+    scores = []
+    for count, length in zip(counts, lengths):
+        score = 0.0
+        for term in terms:
+            frequency = count.get(term, 0)
+            if frequency:
+                score += idf[term] * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * length / average))
+        scores.append(score)
+    return sorted(range(len(chunks)), key=lambda i: (-scores[i], -i))
+
+class ClipboardContext:
+    """
+    Turns clipboard content into LLM context within a token budget.
+
+    Content over `budget` tokens is cut into chunks of whole lines. The first
+    chunk is always kept, and the rest are added by relevance to the spoken
+    query until the budget is used. Omitted lines are marked in place.
+    Content already sent earlier in the conversation (tracked by its hash)
+    is replaced by a short note while that message is still in the history.
+    """
+    def __init__(self, budget=2000, chunk_tokens=200, chars_per_token=3.5):
+        self.budget = budget
+        self.chunk_tokens = chunk_tokens
+        self.chars_per_token = chars_per_token
+        self.sent = {}  # content hash -> context text sent with it
+        self.max_remembered = 32
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode('utf-8', 'replace')).hexdigest()
+
+    def prepare(self, content, query, history=(), stats=None):
+        """
+        Return the context text for `content`. `history` holds the messages
+        that will be sent along. Token counts and timings go to `stats`.
+        """
+        stats = {} if stats is None else stats
+        start = time.perf_counter()
+        stats['clipboard_tokens'] = estimate_tokens(content, self.chars_per_token)
+        if stats['clipboard_tokens'] <= self.budget:
+            context = content
+        else:
+            context = self.select(content, query, stats)
+        with self._lock:
+            previous = self.sent.get(self.content_hash(content))
+        # Only when the same selection was sent and the model still sees it
+        if previous == context and any(context in message["content"] for message in history
+                                       if message["role"] == "user"):
+            context = UNCHANGED_NOTE
+            stats['clipboard_unchanged'] = True
+        stats['context_tokens'] = estimate_tokens(context, self.chars_per_token)
+        stats['clipboard_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return context
+
+    def select(self, content, query, stats):
+        """The first chunk plus the most relevant chunks that fit the budget, in order."""
+        chunks = split_chunks(content, int(self.chunk_tokens * self.chars_per_token))
+        budget_chars = self.budget * self.chars_per_token
+        chosen, used = set(), 0
+        for index in [0] + [i for i in rank_chunks(chunks, query) if i != 0]:
+            size = sum(len(line) + 1 for line in chunks[index][1]) + 40  # room for an omission marker
+            if used + size > budget_chars:
+                continue
+            chosen.add(index)
+            used += size
+        stats['chunks'] = len(chunks)
+        stats['chunks_kept'] = len(chosen)
+
+        parts, expected = [], 0
+        for index in sorted(chosen):
+            if index > expected:
+                parts.append(omission_marker(chunks, expected, index))
+            parts.extend(chunks[index][1])
+            expected = index + 1
+        if expected < len(chunks):
+            parts.append(omission_marker(chunks, expected, len(chunks)))
+        return '\n'.join(parts)
+
+    def remember(self, content, context):
+        """Record that `context` was sent for `content`."""
+        if context == UNCHANGED_NOTE:
+            return
+        with self._lock:
+            self.sent[self.content_hash(content)] = context
+            while len(self.sent) > self.max_remembered:
+                del self.sent[next(iter(self.sent))]  # oldest first
@@ -0,0 +1,124 @@
+# command_index.py
+
+import difflib
+import json
+import os
+import platform
+import threading
+from llm_cache import normalize_query
+
+# Words that carry no meaning for matching a request to a command
+STOPWORDS = {
+    "a", "an", "the", "to", "of", "in", "on", "for", "me", "my", "and",
+    "please", "can", "you", "i", "want", "would", "like", "how", "do", "is",
+    "are", "what", "with", "this", "that", "it", "give", "command", "current",
+}
+
+# Words that invert or narrow a request; two requests that differ in one of
+# them (or in a number) never match
+NEGATIONS = {"not", "no", "without", "except", "never", "dont", "don", "exclude", "excluding"}
+
+def content_tokens(text):
+    return frozenset(token for token in normalize_query(text).split() if token not in STOPWORDS)
+
+def similarity(tokens_a, tokens_b):
+    """
+    Token-set similarity in [0, 1]: the mean of the Jaccard overlap and the
+    sequence ratio of the sorted tokens, so both missing and extra words
+    lower the score.
+    """
+    if not tokens_a or not tokens_b:
+        return 0.0
+    jaccard = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    ratio = difflib.SequenceMatcher(None, ' '.join(sorted(tokens_a)), ' '.join(sorted(tokens_b))).ratio()
+    return (jaccard + ratio) / 2
+
+def conflicting(tokens_a, tokens_b):
+    """True if the token sets differ in a negation word or a number."""
+    return any(token in NEGATIONS or any(ch.isdigit() for ch in token) for token in tokens_a ^ tokens_b)
+
+class CommandIndex:
+    """
+    Local index of spoken requests and their known answers.
+
+    Entries come from a seed file (optionally restricted to some operating
+    systems) and from previously accepted LLM answers.
+    Learned entries only match requests with the same content words, since
+    an answer to one LLM query says nothing about a similar-sounding one.
+    An inverted token index keeps lookups to the few entries that share a
+    word with the request. Files are read on first use (or by load_async)
+    so startup does not pay for them.
+    """
+    def __init__(self, seed_path, learned_path, max_answer_chars=2000):
+        self.seed_path = os.path.expanduser(seed_path)
+        self.learned_path = os.path.expanduser(learned_path)
+        self.max_answer_chars = max_answer_chars
+        self.entries = []       # (tokens, query, answer, learned)
+        self.postings = {}      # token -> entry indices
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load_async(self):
+        threading.Thread(target=self._ensure_loaded, daemon=True).start()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded:
+                return
+            for path, is_jsonl in ((self.seed_path, False), (self.learned_path, True)):
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        records = [json.loads(line) for line in f if line.strip()] if is_jsonl else json.load(f)
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError) as e:
+                    print(f"[ERROR] Could not read command index {path}: {e}")
+                    continue
+                for record in records:
+                    if platform.system() in record.get("os", [platform.system()]):
+                        self._add_entry(record["query"], record["answer"], learned=is_jsonl)
+            self._loaded = True
+            print(f"Command index loaded: {len(self.entries)} entries.")
+
+    def _add_entry(self, query, answer, learned):
+        tokens = content_tokens(query)
+        if not tokens:
+            return
+        index = len(self.entries)
+        self.entries.append((tokens, query, answer, learned))
+        for token in tokens:
+            self.postings.setdefault(token, []).append(index)
+
+    def match(self, query):
+        """Return (score, answer) of the best matching entry, or (0.0, None)."""
+        self._ensure_loaded()
+        tokens = content_tokens(query)
+        with self._lock:
+            candidates = {index for token in tokens for index in self.postings.get(token, ())}
+            best_score, best_answer = 0.0, None
+            for index in candidates:
+                entry_tokens, _, answer, learned = self.entries[index]
+                if (learned and entry_tokens != tokens) or conflicting(tokens, entry_tokens):
+                    continue
+                score = similarity(tokens, entry_tokens)
+                if score > best_score:
+                    best_score, best_answer = score, answer
+        return best_score, best_answer
+
+    def add(self, query, answer):
+        """Remember an accepted answer and append it to the learned file."""
+        if not answer or len(answer) > self.max_answer_chars:
+            return
+        self._ensure_loaded()
+        with self._lock:
+            tokens = content_tokens(query)
+            if any(entry_tokens == tokens and entry_answer == answer
+                   for entry_tokens, _, entry_answer, _ in self.entries):
+                return
+            self._add_entry(query, answer, learned=True)
+            try:
+                os.makedirs(os.path.dirname(self.learned_path), exist_ok=True)
+                with open(self.learned_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"query": query, "answer": answer}) + '\n')
+            except OSError as e:
+                print(f"[ERROR] Could not update command index {self.learned_path}: {e}")
@@ -0,0 +1,120 @@
+# config.py
+
+# ---------------------------- Speech-to-Text ----------------------------
+
+# Any faster-whisper model name or local path
+WHISPER_MODEL = "Systran/faster-distil-whisper-medium.en"
+# Smaller model for the live preview while recording (None uses WHISPER_MODEL)
+WHISPER_PARTIAL_MODEL = "Systran/faster-whisper-base.en"
+# "cuda", "cpu" or "auto" (CUDA when a GPU is visible, CPU otherwise)
+WHISPER_DEVICE = "auto"
+# "auto" picks float16 on CUDA (if the GPU supports it) and int8 on CPU
+WHISPER_COMPUTE_TYPE = "auto"
+# CPU threads per decode (0 lets CTranslate2 decide) and parallel decoders
+WHISPER_CPU_THREADS = 0
+WHISPER_NUM_WORKERS = 1
+# Run one dummy decode after loading so the first utterance is not slowed
+# down by lazy allocations
+WHISPER_WARMUP = True
+# Open the microphone at its native sample rate and channel count and
+# convert to 16 kHz mono in the app (many USB/Bluetooth headsets only offer
+# 44.1/48 kHz or stereo). False asks the host for 16 kHz mono directly.
+AUDIO_NATIVE_FORMAT = True
+# PyAudio input device index (None uses the default input device)
+AUDIO_INPUT_DEVICE = None
+
+# ---------------------------- LLM ----------------------------
+
+# OpenAI-compatible endpoints ("http://<Your api-server IP>:port/v1"). With
+# several, each request goes to the fastest healthy one and fails over to
+# the next on errors.
+LLM_ENDPOINTS = ["http://127.0.0.1:8080/v1"]
+LLM_API_KEY = "sk-no-key-required"
+LLM_REQUEST_TIMEOUT = 60.0
+# Seconds a failed endpoint is skipped (doubling on repeated failures)
+LLM_FAILURE_BACKOFF = 10.0
+# Hedged requests: if the first endpoint has not produced a token after its
+# LLM_HEDGE_PERCENTILE time to first token, send the request to a second
+# endpoint as well and keep whichever answers first. Until an endpoint has
+# LLM_HEDGE_MIN_SAMPLES measurements LLM_HEDGE_DEFAULT_DELAY is used.
+LLM_HEDGE = True
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 10
+LLM_HEDGE_DEFAULT_DELAY = 1.0
+LLM_HEDGE_MIN_DELAY = 0.1
+
+# Stream the answer and show it in the floating window as it arrives
+LLM_STREAMING = True
+# Token budget for the conversation history sent with each request. Older
+# turns are evicted to stay under it and, with LLM_HISTORY_SUMMARY, folded
+# into a short summary in the background.
+LLM_HISTORY_BUDGET = 6000
+LLM_HISTORY_SUMMARY = True
+LLM_SUMMARY_MAX_TOKENS = 200
+# Characters per token used to estimate prompt sizes
+LLM_CHARS_PER_TOKEN = 3.5
+# Clipboard content ("buffer" command) over this many tokens is cut into
+# chunks of CLIPBOARD_CHUNK_TOKENS and only the chunks most relevant to the
+# spoken query are sent
+CLIPBOARD_TOKEN_BUDGET = 2000
+CLIPBOARD_CHUNK_TOKENS = 200
+# Send the live transcript to the LLM once it has been stable for
+# LLM_SPECULATE_AFTER seconds; the answer is reused if the final query
+# matches and the request is cancelled otherwise
+LLM_SPECULATIVE = True
+LLM_SPECULATE_AFTER = 0.8
+# On-disk cache of answers, used only while memory is off. Keyed on the
+# normalized spoken query, the system prompt and the clipboard context.
+LLM_CACHE = True
+LLM_CACHE_PATH = "~/.cache/ai-voiceassistant/responses.sqlite"
+LLM_CACHE_MAX_ENTRIES = 1000
+LLM_CACHE_TTL = 7 * 24 * 3600  # seconds
+# Local command index answering common requests without the LLM. Built from
+# the seed file and from earlier answers; matches scoring below the
+# threshold fall through to the LLM.
+COMMAND_INDEX = True
+COMMAND_INDEX_SEED = "commands_seed.json"
+COMMAND_INDEX_LEARNED = "~/.cache/ai-voiceassistant/commands.jsonl"
+COMMAND_INDEX_THRESHOLD = 0.9
+# llama.cpp only (detected with a GET /props probe): reuse the server's
+# prompt cache and pin requests to one slot so the system prompt is not
+# processed again for every query. None lets the server pick a slot.
+LLM_PROMPT_CACHE = True
+LLM_SLOT_ID = 0
+LLM_PROBE_TIMEOUT = 1.0
+
+# ---------------------------- Pipeline ----------------------------
+
+# Utterances waiting between the pipeline stages (STT -> LLM -> paste).
+# A new utterance cancels older ones, so one slot per stage is enough.
+PIPELINE_QUEUE_SIZE = 1
+
+# ---------------------------- Startup ----------------------------
+
+# The system prompt (OS, GPU, shell, ... details) is cached here and only
+# regenerated when a cheap fingerprint of the machine changes. None disables
+# the cache.
+SYSTEM_PROMPT_CACHE = "~/.cache/ai-voiceassistant/system_prompt.json"
+
+# ---------------------------- Tracing ----------------------------
+
+# Per-stage latency spans (hotkey, STT passes, LLM, paste) appended to a
+# rotating JSONL file. `python tracing.py summary` prints p50/p95/p99.
+TRACING = True
+TRACE_PATH = "~/.cache/ai-voiceassistant/traces.jsonl"
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+# ---------------------------- STT Daemon ----------------------------
+
+# stt_daemon.py serves clients on this Unix socket (or on localhost TCP
+# DAEMON_TCP_PORT when set, and on platforms without Unix sockets)
+DAEMON_SOCKET = "~/.cache/ai-voiceassistant/stt.sock"
+DAEMON_TCP_PORT = None
+# Windows from concurrent clients are decoded together: up to
+# DAEMON_MAX_BATCH per batch, after waiting DAEMON_BATCH_WAIT seconds for
+# other clients' windows to arrive
+DAEMON_MAX_BATCH = 8
+DAEMON_BATCH_WAIT = 0.01
+# Minimum seconds between live transcript updates per client
+DAEMON_PARTIAL_INTERVAL = 0.5
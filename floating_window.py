@@ -0,0 +1,97 @@
+# floating_window.py
+
+from PyQt6.QtWidgets import QLabel, QWidget
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QGuiApplication
+import stt_module
+
+# One style sheet for every state, parsed once; a state only switches the
+# label's "state" property
+LABEL_STYLE = """
+QLabel {
+    color: #EEEEEE;
+    background-color: #222222;
+    font-size: 22px;
+    padding: 20px;
+    border: 4px solid #EEEEEE;
+}
+QLabel[state="done"] {
+    border-color: #AA0000;
+}
+"""
+
+def refresh_interval_ms():
+    """Frame time of the primary screen (16 ms if unknown)."""
+    screen = QGuiApplication.primaryScreen()
+    rate = screen.refreshRate() if screen is not None else 0
+    return max(1, round(1000 / rate)) if rate > 0 else 16
+
+# ---------------------------- PyQt Floating Window ----------------------------
+
+class FloatingWindow(QWidget):
+    # Emitted from the worker threads; Qt delivers them on the GUI thread
+    transcript_received = pyqtSignal(str)
+    state_received = pyqtSignal(str)
+    # Emitted when the user closes the window; main.py cancels the pipeline job
+    closed = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Transcription")
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setWindowOpacity(0.8)
+        self.setGeometry(1600, 200, 800, 300)
+
+        self.label = QLabel("Start speaking...", self)
+        self.label.setProperty("state", stt_module.WINDOW_ACTIVE)
+        self.label.setStyleSheet(LABEL_STYLE)
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.label.setWordWrap(True)
+        self.label.setFixedSize(800, 300)
+
+        # Transcript updates are shown at most once per frame: the first one
+        # right away, later ones in the same frame coalesced into the newest
+        self.pending_text = None
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(refresh_interval_ms())
+        self.frame_timer.timeout.connect(self.flush_transcription)
+
+        self.transcript_received.connect(self.update_transcription)
+        self.state_received.connect(self.set_state)
+        stt_module.transcript_listeners.append(self.transcript_received.emit)
+        stt_module.state_listeners.append(self.state_received.emit)
+
+    def set_state(self, state: str):
+        """Switch the border to the precomputed style of a window state."""
+        if self.label.property("state") == state:
+            return
+        self.label.setProperty("state", state)
+        self.label.style().unpolish(self.label)
+        self.label.style().polish(self.label)
+
+    def update_transcription(self, transcription: str):
+        if self.frame_timer.isActive():
+            self.pending_text = transcription
+            return
+        self.show_text(transcription)
+        self.frame_timer.start()
+
+    def flush_transcription(self):
+        if self.pending_text is not None:
+            text, self.pending_text = self.pending_text, None
+            self.show_text(text)
+            self.frame_timer.start()
+
+    def show_text(self, text):
+        if text != self.label.text():
+            self.label.setText(text)
+
+    def closeEvent(self, event):
+        """
+        Override the close event to ensure transcription stops when the window is closed.
+        The recording is stopped through the pipeline, which releases the microphone.
+        """
+        self.closed.emit()
+        event.accept()
@@ -0,0 +1,99 @@
+# llm_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+def normalize_query(text):
+    """Lowercase, drop punctuation and collapse whitespace of a spoken query."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+class ResponseCache:
+    """
+    Persistent LLM answer cache backed by SQLite.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once there are more than `max_entries`.
+    """
+    def __init__(self, path, max_entries=1000, ttl=7 * 24 * 3600):
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        # Opened on first use so startup does not touch the disk
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        return self._db
+
+    @staticmethod
+    def key(query, system_prompt, clipboard=None):
+        """Cache key of a spoken query, the system prompt and the clipboard context."""
+        digest = hashlib.sha256()
+        for part in (normalize_query(query), system_prompt, clipboard or ''):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT answer, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                row = None
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.stats['hits'] += 1
+            return row[0]
+
+    def contains(self, key):
+        """Check for a live entry without touching the stats or LRU order."""
+        with self._lock:
+            row = self._connect().execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def put(self, key, answer):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, answer, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now)
+            )
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            db.commit()
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            db = self._connect()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            self.stats.update(hits=0, misses=0)
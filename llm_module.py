@@ -1,23 +1,165 @@
 # llm_module.py
 
-import openai
+import math
+import time
 import threading
+import config
+from llm_pool import EndpointPool
 
-client = openai.OpenAI(
-    base_url="http://127.0.0.1:8080/v1",  # "http://<Your api-server IP>:port"
-    api_key="sk-no-key-required"
-)
+# Requests are routed over every endpoint in config.LLM_ENDPOINTS
+pool = EndpointPool(config.LLM_ENDPOINTS, config.LLM_API_KEY)
 
 # Your existing request messages
 conversation_history = []
 
+# The system message is built once and reused so the prompt prefix stays
+# byte-identical between requests and the server can reuse its KV cache.
+system_message = None
+
 # Thread lock for conversation history
 history_lock = threading.Lock()
+summary_lock = threading.Lock()  # one summary at a time, each building on the last
+
+# Returned instead of an answer when the API call fails
+ERROR_ANSWER = "I'm sorry, I couldn't process your request at this time."
+
+# Timings of the last streamed response (seconds)
+last_response_timings = {}
 
 # Function to add a message to the conversation history
 def add_message(role, content):
+    message = {"role": role, "content": content}
+    with history_lock:
+        conversation_history.append(message)
+    return message
+
+def remove_message(message):
+    """Take back a message, e.g. the query of a cancelled request."""
+    with history_lock:
+        for index in range(len(conversation_history) - 1, -1, -1):
+            if conversation_history[index] is message:
+                del conversation_history[index]
+                return
+
+def reset_history(system_prompt):
+    """Start a new conversation with the (cached) system message."""
+    global conversation_history, system_message
+    if system_message is None or system_message["content"] != system_prompt:
+        system_message = {"role": "system", "content": system_prompt}
+    with history_lock:
+        conversation_history = [system_message]
+
+def set_system_prompt(system_prompt):
+    """Replace the system message, keeping the rest of the conversation."""
+    global system_message
+    system_message = {"role": "system", "content": system_prompt}
+    with history_lock:
+        if conversation_history:
+            conversation_history[0] = system_message
+        else:
+            conversation_history.append(system_message)
+
+# ---------------------------- Backend Capabilities ----------------------------
+
+def probe_endpoints():
+    """Detect the backend of every endpoint ahead of the first query."""
+    pool.probe()
+
+def record_server_timings(response, timings):
+    """Keep llama.cpp's prompt/generation timings when the server reports them."""
+    server_timings = getattr(response, 'timings', None)
+    if isinstance(server_timings, dict):
+        timings['prompt_tokens'] = server_timings.get('prompt_n')
+        timings['prompt_ms'] = server_timings.get('prompt_ms')
+
+# ---------------------------- History Budget ----------------------------
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+def estimate_tokens(message):
+    """Rough token count of a chat message (content plus per-message overhead)."""
+    return math.ceil(len(message["content"]) / config.LLM_CHARS_PER_TOKEN) + 4
+
+def history_tokens(history=None):
+    return sum(estimate_tokens(message) for message in (history or conversation_history))
+
+def is_summary(message):
+    return message["role"] == "system" and message["content"].startswith(SUMMARY_PREFIX)
+
+def trim_history(budget):
+    """
+    Evict the oldest turns until the history fits the token budget. The
+    system prompt, the summary message and the latest turn are kept.
+    Returns the evicted messages.
+    """
+    evicted = []
+    with history_lock:
+        total = history_tokens(conversation_history)
+        keep = 1 + (len(conversation_history) > 1 and is_summary(conversation_history[1]))
+        while total > budget and len(conversation_history) > keep + 2:
+            message = conversation_history.pop(keep)
+            total -= estimate_tokens(message)
+            evicted.append(message)
+            # Evict whole turns so user/assistant roles keep alternating
+            while len(conversation_history) > keep + 2 and conversation_history[keep]["role"] != "user":
+                message = conversation_history.pop(keep)
+                total -= estimate_tokens(message)
+                evicted.append(message)
+    return evicted
+
+def summarize_evicted(history, evicted):
+    """
+    Fold evicted turns into the summary message. Runs in the background
+    once the answer was stored, so it never competes with the query for the
+    server. Summaries run one at a time so none overwrites another.
+    """
+    with summary_lock:
+        _summarize(history, evicted)
+
+def _summarize(history, evicted):
+    previous = ''
+    with history_lock:
+        if len(history) > 1 and is_summary(history[1]):
+            previous = history[1]["content"][len(SUMMARY_PREFIX):]
+    transcript = '\n'.join(f"{message['role']}: {message['content']}" for message in evicted)
+    try:
+        completion = pool.create(dict(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "Summarize the conversation below in a few short sentences. "
+                                              "Keep commands, file names, paths and values that later requests may refer to."},
+                {"role": "user", "content": (previous + '\n' + transcript).strip()}
+            ],
+            temperature=0.2,
+            max_tokens=config.LLM_SUMMARY_MAX_TOKENS
+        ), pin_slot=False)  # not pinned: the summary must not evict the conversation's KV cache
+        summary = {"role": "system", "content": SUMMARY_PREFIX + completion.choices[0].message.content.strip()}
+    except Exception as e:
+        print(f"[ERROR] History summarization failed: {e}")
+        return
+    with history_lock:
+        # The history may have been reset in the meantime
+        if history is conversation_history and history:
+            if len(history) > 1 and is_summary(history[1]):
+                history[1] = summary
+            else:
+                history.insert(1, summary)
+
+def enforce_history_budget():
+    """
+    Trim the history to config.LLM_HISTORY_BUDGET, summarizing evicted turns
+    if enabled. Called once an answer is stored, never before a request.
+    """
+    evicted = trim_history(config.LLM_HISTORY_BUDGET)
+    if evicted:
+        print(f"Evicted {len(evicted)} messages from the conversation history.")
+        if config.LLM_HISTORY_SUMMARY:
+            threading.Thread(target=summarize_evicted, args=(conversation_history, evicted), daemon=True).start()
+
+def print_history_stats():
     with history_lock:
-        conversation_history.append({"role": role, "content": content})
+        count, tokens = len(conversation_history), history_tokens(conversation_history)
+    print(f"Conversation history: {count} messages, ~{tokens} tokens (budget {config.LLM_HISTORY_BUDGET})")
 
 def clean_code_block(text: str) -> str:
     # Check if the string starts with ```
@@ -32,22 +174,236 @@ def clean_code_block(text: str) -> str:
     # Remove any trailing newline characters
     return text.rstrip()
 
-# Function to get a response from the OpenAI API
-def get_response(query):
-    add_message("user", query)
+class CodeBlockStreamCleaner:
+    """
+    Streaming counterpart of clean_code_block.
+
+    feed() returns the part of the text seen so far that can no longer be
+    affected by fence stripping: the opening ``` line is dropped once it is
+    complete, and trailing backticks and whitespace are held back until the
+    next chunk (or finish()) shows whether they close the block.
+    """
+    def __init__(self):
+        self._head = ''
+        self._head_done = False
+        self._tail = ''
+
+    def feed(self, chunk: str) -> str:
+        if not self._head_done:
+            self._head += chunk
+            if "```".startswith(self._head):
+                return ''  # too short to tell whether it opens a fence
+            if self._head.startswith("```"):
+                if "\n" not in self._head:
+                    return ''
+                chunk = self._head.split("\n", 1)[1]
+            else:
+                chunk = self._head
+            self._head_done = True
+            self._head = ''
+
+        text = self._tail + chunk
+        stripped = text.rstrip()
+        backticks = len(stripped) - len(stripped.rstrip('`'))
+        hold_from = len(stripped[:len(stripped) - min(backticks, 3)].rstrip())
+        self._tail = text[hold_from:]
+        return text[:hold_from]
+
+    def finish(self) -> str:
+        if not self._head_done:
+            if self._head.startswith("```"):
+                # A single-line fenced answer never completed its opening line
+                return self._head.strip('`').strip()
+            return clean_code_block(self._head)
+        tail = self._tail.rstrip()
+        if tail.endswith("```"):
+            tail = tail[:-3]
+        self._tail = ''
+        return tail.rstrip()
+
+# Function to get a response from the OpenAI API (None once cancel_event is set)
+def get_response(query, cancel_event=None):
+    message = add_message("user", query)
     try:
-        completion = client.chat.completions.create(
+        last_response_timings.clear()
+        start = time.perf_counter()
+        completion = pool.create(dict(
             model="gpt-3.5-turbo",
-            messages=conversation_history,
+            messages=list(conversation_history),
             temperature=0.5,
             max_tokens=1024,
             top_p=0.8
-        )
+        ), timings=last_response_timings, cancel_event=cancel_event)
+        if completion is None:
+            remove_message(message)
+            return None
+        last_response_timings['total'] = time.perf_counter() - start
+        record_server_timings(completion, last_response_timings)
         output = completion.choices[0].message.content
         answer = clean_code_block(output)
         add_message("assistant", answer)
-        print('Conversation history: \n', conversation_history)
+        enforce_history_budget()
+        print_history_stats()
         return answer
     except Exception as e:
         print(f"[ERROR] LLM API call failed: {e}")
-        return "I'm sorry, I couldn't process your request at this time."
+        last_response_timings['error'] = str(e)
+        remove_message(message)
+        return ERROR_ANSWER
+
+def completion_stream(messages, cancel_event=None, timings=None):
+    """
+    Stream a completion for `messages` and yield the cleaned answer piece by
+    piece. Stops and closes the connection (freeing the server slot) once
+    `cancel_event` is set. Time to first token, total time and the answering
+    endpoint go to `timings`.
+    """
+    timings = {} if timings is None else timings
+    cleaner = CodeBlockStreamCleaner()
+    start = time.perf_counter()
+    stream = pool.stream(dict(
+        model="gpt-3.5-turbo",
+        messages=messages,
+        temperature=0.5,
+        max_tokens=1024,
+        top_p=0.8
+    ), cancel_event, timings=timings)
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            record_server_timings(chunk, timings)
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if 'first_token' not in timings:
+                timings['first_token'] = time.perf_counter() - start
+            text = cleaner.feed(chunk.choices[0].delta.content)
+            if text:
+                yield text
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        text = cleaner.finish()
+        if text:
+            yield text
+        timings['total'] = time.perf_counter() - start
+    finally:
+        stream.close()
+
+def print_response_timings(timings):
+    message = (f"LLM time to first token: {timings.get('first_token', 0):.2f}s, "
+               f"total: {timings.get('total', 0):.2f}s")
+    if timings.get('prompt_tokens') is not None:
+        message += f", prompt eval: {timings['prompt_tokens']} tokens in {timings['prompt_ms']:.0f} ms"
+    if len(pool.endpoints) > 1 and 'endpoint' in timings:
+        message += f", endpoint: {timings['endpoint']}" + (" (hedged)" if timings.get('hedged') else "")
+    print(message)
+
+def stream_response(query, cancel_event=None):
+    """
+    Like get_response, but yields the cleaned answer piece by piece as the
+    server streams it. Time to first token and total time are printed and
+    kept in last_response_timings. Unless the answer is complete (the
+    request failed, `cancel_event` was set or the caller closed the
+    generator early) the query is taken back out of the history. On failure
+    last_response_timings['error'] is set, so a partial answer is not
+    mistaken for a complete one.
+    """
+    message = add_message("user", query)
+    parts = []
+    stored = False
+    last_response_timings.clear()
+    try:
+        try:
+            for text in completion_stream(list(conversation_history), cancel_event, last_response_timings):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            print(f"[ERROR] LLM API call failed: {e}")
+            last_response_timings['error'] = str(e)
+            remove_message(message)
+            if not parts:
+                yield ERROR_ANSWER
+            return
+        if cancel_event is not None and cancel_event.is_set():
+            return
+
+        add_message("assistant", ''.join(parts))
+        stored = True
+        enforce_history_budget()
+        print_response_timings(last_response_timings)
+        print_history_stats()
+    finally:
+        if not stored:
+            remove_message(message)
+
+# ---------------------------- Speculative Requests ----------------------------
+
+class SpeculativeResponse:
+    """
+    A completion started before the user finished the query.
+
+    The answer streams into a buffer on a background thread. If the final
+    query turns out to be the same, stream() replays the buffered pieces and
+    follows the rest; otherwise cancel() drops the request.
+    """
+    def __init__(self, query, messages):
+        self.query = query
+        self.messages = messages
+        self.pieces = []
+        self.error = None
+        self.done = False
+        self.timings = {}
+        self._cancel = threading.Event()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for text in completion_stream(self.messages, self._cancel, self.timings):
+                with self._cond:
+                    self.pieces.append(text)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+            self.timings['error'] = str(e)
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def stream(self):
+        """Yield the buffered pieces, then the remaining ones as they arrive."""
+        index = 0
+        while True:
+            with self._cond:
+                while index == len(self.pieces) and not self.done:
+                    self._cond.wait()
+                pieces = self.pieces[index:]
+                finished = self.done
+            for text in pieces:
+                yield text
+            index += len(pieces)
+            if finished and index == len(self.pieces):
+                break
+        if self.error is not None:
+            print(f"[ERROR] LLM API call failed: {self.error}")
+            if not self.pieces:
+                yield ERROR_ANSWER
+
+    def adopt(self):
+        """Record the speculative turn in the conversation history."""
+        if self.error is None:
+            add_message("user", self.query)
+            add_message("assistant", ''.join(self.pieces))
+            enforce_history_budget()
+        last_response_timings.clear()
+        last_response_timings.update(self.timings)
+        print_response_timings(self.timings)
+        print_history_stats()
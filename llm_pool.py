@@ -0,0 +1,347 @@
+# llm_pool.py
+
+import bisect
+import json
+import queue
+import threading
+import time
+import urllib.request
+import config
+
+# Seconds between checks of a request's cancel_event while waiting on the server
+CANCEL_POLL = 0.05
+
+# ---------------------------- Latency Histogram ----------------------------
+
+class LatencyHistogram:
+    """
+    Log-spaced latency histogram (10 ms to ~2 min, 25% wide buckets).
+    Percentiles are reported as the upper bound of the bucket they fall in.
+    """
+    BOUNDS = [0.01 * 1.25 ** i for i in range(43)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, p):
+        """Latency below which `p` percent of the samples fall, or None without samples."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = p / 100 * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return self.BOUNDS[i] if i < len(self.BOUNDS) else float('inf')
+        return float('inf')
+
+    def summary(self):
+        if not self.count:
+            return "no samples"
+        return (f"n={self.count} mean={self.total / self.count * 1000:.0f}ms "
+                f"p50={self.percentile(50) * 1000:.0f}ms p95={self.percentile(95) * 1000:.0f}ms "
+                f"p99={self.percentile(99) * 1000:.0f}ms")
+
+# ---------------------------- Endpoints ----------------------------
+
+class Endpoint:
+    """
+    One OpenAI-compatible server. The client is created once (on first use,
+    since importing openai is slow) and reused, so requests go over its pool
+    of keep-alive connections. Failures put the endpoint in an exponential
+    back-off during which it is only used as a last resort.
+    """
+    def __init__(self, base_url, api_key):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.backend = None  # "llama.cpp" or "openai", set by detect_backend()
+        self.first_token = LatencyHistogram()
+        self.total = LatencyHistogram()
+        self.failures = 0
+        self.errors = 0
+        self.down_until = 0.0
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                import openai
+                self._client = openai.OpenAI(base_url=self.base_url, api_key=self.api_key,
+                                             timeout=config.LLM_REQUEST_TIMEOUT, max_retries=0)
+            return self._client
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def record_success(self, first_token, total):
+        self.first_token.record(first_token)
+        self.total.record(total)
+        self.failures = 0
+        self.down_until = 0.0
+
+    def record_failure(self, error):
+        self.failures += 1
+        self.errors += 1
+        backoff = config.LLM_FAILURE_BACKOFF * 2 ** min(self.failures - 1, 5)
+        self.down_until = time.monotonic() + backoff
+        print(f"[WARNING] LLM endpoint {self.base_url} failed ({error}); skipping it for {backoff:.0f}s")
+
+    def detect_backend(self):
+        """
+        Probe the server once. llama.cpp answers GET /props; anything else is
+        treated as a plain OpenAI-compatible API.
+        """
+        if self.backend is not None:
+            return self.backend
+        root = self.base_url[:-3] if self.base_url.endswith('/v1') else self.base_url
+        try:
+            with urllib.request.urlopen(root + '/props', timeout=config.LLM_PROBE_TIMEOUT) as response:
+                is_llama_cpp = 'default_generation_settings' in json.load(response)
+        except Exception:
+            is_llama_cpp = False
+        self.backend = "llama.cpp" if is_llama_cpp else "openai"
+        print(f"LLM backend at {self.base_url}: {self.backend}")
+        return self.backend
+
+    def request_options(self, pin_slot=True):
+        """
+        Extra request parameters for this backend. On llama.cpp the prompt
+        cache is enabled and the conversation is pinned to one slot, so the
+        system prompt prefix is only processed once.
+        """
+        if not config.LLM_PROMPT_CACHE or self.detect_backend() != "llama.cpp":
+            return {}
+        body = {"cache_prompt": True}
+        if pin_slot and config.LLM_SLOT_ID is not None:
+            body["id_slot"] = config.LLM_SLOT_ID
+        return {"extra_body": body}
+
+class _Attempt:
+    """A request to one endpoint, run on its own thread and reporting to `events`."""
+    def __init__(self, endpoint, events, request, stream, pin_slot, cancel_event):
+        self.endpoint = endpoint
+        self.cancel = threading.Event()
+        self.pending = []  # chunks received before the race was decided
+        self.response = None
+        self._events = events
+        self._cancel_event = cancel_event
+        self._thread = threading.Thread(target=self._run, args=(request, stream, pin_slot), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Cancel the attempt and close its open stream, freeing the server slot now."""
+        self.cancel.set()
+        response = self.response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def _cancelled(self):
+        return self.cancel.is_set() or (self._cancel_event is not None and self._cancel_event.is_set())
+
+    def _run(self, request, stream, pin_slot):
+        start = time.perf_counter()
+        first_token = None
+        try:
+            response = self.endpoint.client.chat.completions.create(
+                stream=stream, **request, **self.endpoint.request_options(pin_slot))
+            if not stream:
+                first_token = time.perf_counter() - start
+                self._events.put((self, 'result', response))
+            else:
+                self.response = response
+                if self.cancel.is_set():
+                    response.close()  # stopped while waiting for the headers
+                try:
+                    for chunk in response:
+                        if self._cancelled():
+                            break
+                        if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                            first_token = time.perf_counter() - start
+                        self._events.put((self, 'chunk', chunk))
+                finally:
+                    response.close()
+        except Exception as e:
+            if self._cancelled():
+                self._events.put((self, 'cancelled', None))
+            else:
+                self.endpoint.record_failure(e)
+                self._events.put((self, 'error', e))
+            return
+        if self._cancelled():
+            self._events.put((self, 'cancelled', None))
+            return
+        total = time.perf_counter() - start
+        self.endpoint.record_success(total if first_token is None else first_token, total)
+        if stream:
+            self._events.put((self, 'done', None))
+
+class EndpointPool:
+    """
+    Routes chat completions over several OpenAI-compatible endpoints.
+
+    Requests go to the healthy endpoint with the lowest median time to first
+    token. If it has not produced a token by the hedge deadline (its p95,
+    see hedge_delay), the same request is sent to the next endpoint and the
+    first one to answer wins; the other is cancelled. Failed requests fail
+    over to the next endpoint as long as no answer text was delivered.
+    """
+    def __init__(self, urls, api_key):
+        self.endpoints = [Endpoint(url, api_key) for url in urls]
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+        self._lock = threading.Lock()
+
+    def ranked(self):
+        """Healthy endpoints by median time to first token, then the ones in back-off."""
+        def median(endpoint):
+            return endpoint.first_token.percentile(50) or 0.0  # unmeasured ones get tried
+        healthy = sorted((e for e in self.endpoints if e.healthy), key=median)
+        down = sorted((e for e in self.endpoints if not e.healthy), key=lambda e: e.down_until)
+        return healthy + down
+
+    def hedge_delay(self, endpoint):
+        """Seconds to wait for a first token from `endpoint` before hedging."""
+        if endpoint.first_token.count < config.LLM_HEDGE_MIN_SAMPLES:
+            delay = config.LLM_HEDGE_DEFAULT_DELAY
+        else:
+            delay = endpoint.first_token.percentile(config.LLM_HEDGE_PERCENTILE)
+        return max(delay, config.LLM_HEDGE_MIN_DELAY)
+
+    def probe(self):
+        """
+        Create the clients and detect the backend of every endpoint (run in
+        the background at startup).
+        """
+        for endpoint in self.endpoints:
+            endpoint.client
+            endpoint.detect_backend()
+
+    def create(self, request, pin_slot=True, timings=None, cancel_event=None):
+        """
+        Non-streaming chat completion. Raises the last error if every endpoint
+        fails; returns None once `cancel_event` is set.
+        """
+        for _, response in self._race(request, False, pin_slot, cancel_event, timings):
+            return response
+
+    def stream(self, request, cancel_event=None, pin_slot=True, timings=None):
+        """Streaming chat completion; yields the chunks of the winning endpoint."""
+        for _, chunk in self._race(request, True, pin_slot, cancel_event, timings):
+            yield chunk
+
+    def _race(self, request, stream, pin_slot, cancel_event, timings):
+        with self._lock:
+            self.stats['requests'] += 1
+        candidates = self.ranked()
+        events = queue.Queue()
+        attempts = []
+        hedged = False
+
+        def launch():
+            attempts.append(_Attempt(candidates.pop(0), events, request, stream, pin_slot, cancel_event))
+
+        def next_event(timeout=None):
+            """events.get() that gives up (returns None) once cancel_event is set."""
+            if cancel_event is None:
+                return events.get(timeout=timeout)
+            while not cancel_event.is_set():
+                step = CANCEL_POLL if timeout is None else min(timeout, CANCEL_POLL)
+                try:
+                    return events.get(timeout=step)
+                except queue.Empty:
+                    if timeout is not None:
+                        timeout -= step
+                        if timeout <= 0:
+                            raise
+            return None
+
+        launch()
+        deadline = time.monotonic() + self.hedge_delay(attempts[0].endpoint)
+        winner = None
+        try:
+            while winner is None:
+                wait = None
+                if config.LLM_HEDGE and not hedged and candidates and candidates[0].healthy:
+                    wait = max(deadline - time.monotonic(), 0)
+                try:
+                    event = next_event(wait)
+                except queue.Empty:
+                    hedged = True
+                    with self._lock:
+                        self.stats['hedged'] += 1
+                    launch()
+                    continue
+                if event is None:
+                    return
+                attempt, kind, payload = event
+                if kind == 'cancelled':
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    continue
+                if kind == 'error':
+                    attempts.remove(attempt)
+                    if not attempts:
+                        if not candidates:
+                            raise payload
+                        with self._lock:
+                            self.stats['failovers'] += 1
+                        launch()
+                        deadline = time.monotonic() + self.hedge_delay(attempts[0].endpoint)
+                    continue
+                if kind == 'chunk' and not (payload.choices and payload.choices[0].delta.content):
+                    attempt.pending.append(payload)  # role/metadata chunk, not a token yet
+                    continue
+                winner = attempt
+
+            if winner is not attempts[0]:
+                with self._lock:
+                    self.stats['hedge_wins'] += 1
+            if timings is not None:
+                timings['endpoint'] = winner.endpoint.base_url
+                timings['hedged'] = hedged
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.stop()
+
+            for chunk in winner.pending:
+                yield 'chunk', chunk
+            while kind not in ('done', 'result', 'cancelled'):
+                yield kind, payload
+                event = next_event()
+                while event is not None and event[0] is not winner:
+                    event = next_event()
+                if event is None:
+                    return
+                attempt, kind, payload = event
+                if kind == 'error':
+                    raise payload
+            if kind == 'result':
+                yield kind, payload
+        finally:
+            for attempt in attempts:
+                attempt.stop()
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"LLM requests: {stats['requests']}, hedged: {stats['hedged']} "
+              f"(won {stats['hedge_wins']}), failovers: {stats['failovers']}")
+        for endpoint in self.endpoints:
+            state = "up" if endpoint.healthy else "backing off"
+            print(f"  {endpoint.base_url} [{endpoint.backend or 'unprobed'}, {state}, {endpoint.errors} errors]")
+            print(f"    first token: {endpoint.first_token.summary()}")
+            print(f"    total:       {endpoint.total.summary()}")
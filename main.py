@@ -1,6 +1,15 @@
 # main.py
 
 import os, sys, time
+startup_time = time.perf_counter()
+
+# --profile-startup: time every import from here on and print a breakdown
+# (plus the startup phases) once everything is loaded, then quit
+from startup_profile import StartupProfiler
+profiler = StartupProfiler(startup_time).install() if '--profile-startup' in sys.argv else None
+
+# Only Qt and the hotkey listener are imported up front. torch,
+# faster_whisper and openai are imported by the background preloader.
 import platform
 import threading
 import signal
@@ -9,32 +18,100 @@ from pynput.keyboard import Controller, Key
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
 from PyQt6.QtCore import Qt, pyqtSignal, QObject
 from PyQt6.QtGui import QIcon, QAction
-import pyperclip
 
+import glob
+import hashlib
+import importlib.util
+import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-try:
-    import GPUtil
-except ImportError:
-    GPUtil = None
 
 # Import modules
+import config
 import stt_module
 import llm_module
+from llm_cache import ResponseCache, normalize_query
+from command_index import CommandIndex
+from clipboard_context import ClipboardContext
+from tracing import tracer
+from pipeline import Pipeline
+if profiler is not None:
+    profiler.mark("imports done")
 
 # Communicator class to handle signals between threads
 class Communicator(QObject):
     start_transcription = pyqtSignal()
     stop_transcription = pyqtSignal()
+    hide_window = pyqtSignal()
+    status_changed = pyqtSignal(str)
+    startup_finished = pyqtSignal()
 
 kb_controller = Controller()
+communicator = None
+tray_icon = None
+tray_status_action = None
+app_icon = None
+loading_icon = None
+
+# Readiness states shown in the tray
+STATUS_LOADING = "Loading speech model..."
+STATUS_READY = "Ready"
+STATUS_FAILED = "Speech model failed to load"
 
 # Initialize global variables
-query = ''
+pipeline = None  # Pipeline running each utterance from capture to paste
 base_system_prompt = ''
 llm_memory = False
+speculation = None  # (transcript, llm_module.SpeculativeResponse, match key)
+speculation_lock = threading.Lock()
+hotkey_times = {}  # "start"/"stop" -> perf_counter() when the hotkey fired
+response_cache = ResponseCache(
+    config.LLM_CACHE_PATH,
+    max_entries=config.LLM_CACHE_MAX_ENTRIES,
+    ttl=config.LLM_CACHE_TTL
+) if config.LLM_CACHE else None
+command_index = CommandIndex(
+    config.COMMAND_INDEX_SEED,
+    config.COMMAND_INDEX_LEARNED
+) if config.COMMAND_INDEX else None
+clipboard_context = ClipboardContext(
+    budget=config.CLIPBOARD_TOKEN_BUDGET,
+    chunk_tokens=config.CLIPBOARD_CHUNK_TOKENS,
+    chars_per_token=config.LLM_CHARS_PER_TOKEN
+)
+
+
+
+PROMPT_INSTRUCTIONS = (
+    "You are an expert AI system specializing in generating clean and concise code or shell commands. "
+    "Provide only the requested output in the most efficient and direct manner. "
+    "When given a task, respond exclusively with functional code or shell commands, avoiding any additional explanations, comments, or docstrings. "
+    "If task is not writing code, assume you are in the shell. "
+)
+
+def read_os_distribution():
+    try:
+        with open('/etc/os-release') as f:
+            for line in f:
+                if line.startswith('PRETTY_NAME='):
+                    return line.strip().split('=')[1].strip('"')
+    except FileNotFoundError:
+        pass
+    return "Unknown"
+
+def detect_gpus():
+    try:
+        import GPUtil
+    except ImportError:
+        return "GPUtil not installed"
+    return [gpu.name for gpu in GPUtil.getGPUs()]
 
-
+def detect_package_manager():
+    for manager in ("apt", "yum", "dnf"):
+        if shutil.which(manager):
+            return manager
+    return "Unknown"
 
 def gather_system_info():
     info = {}
@@ -43,64 +120,47 @@ def gather_system_info():
     info["os"] = platform.system()
     info["os_version"] = platform.version()
     info["os_release"] = platform.release()
-    if info["os"] == "Linux":
-        try:
-            with open('/etc/os-release') as f:
-                for line in f:
-                    if line.startswith('PRETTY_NAME='):
-                        info["os_distribution"] = line.strip().split('=')[1].strip('"')
-                        break
-        except FileNotFoundError:
-            info["os_distribution"] = "Unknown"
-    else:
-        info["os_distribution"] = "Unknown"
 
-    # Shell
-    info["shell"] = os.environ.get("SHELL", "cmd" if info["os"] == "Windows" else "Unknown")
+    # The slow probes (nvidia-smi, /etc/os-release, PATH lookups) run concurrently
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        distribution = executor.submit(read_os_distribution) if info["os"] == "Linux" else None
+        cpu = executor.submit(platform.processor)
+        gpus = executor.submit(detect_gpus)
+        package_manager = executor.submit(detect_package_manager) if info["os"] == "Linux" else None
 
-    # CPU info
-    info["cpu"] = platform.processor()
+        info["os_distribution"] = distribution.result() if distribution else "Unknown"
 
-    # GPU info
-    if GPUtil:
-        gpus = GPUtil.getGPUs()
-        info["gpus"] = [gpu.name for gpu in gpus]
-    else:
-        info["gpus"] = "GPUtil not installed"
+        # Shell
+        info["shell"] = os.environ.get("SHELL", "cmd" if info["os"] == "Windows" else "Unknown")
 
-    # Python version
-    info["python_version"] = platform.python_version()
+        # CPU info
+        info["cpu"] = cpu.result()
 
-    # Path separator
-    info["path_separator"] = os.path.sep
+        # GPU info
+        info["gpus"] = gpus.result()
 
-    # Home directory
-    info["home_directory"] = str(Path.home())
+        # Python version
+        info["python_version"] = platform.python_version()
 
-    # Package manager (Linux)
-    if info["os"] == "Linux":
-        if shutil.which("apt"):
-            info["package_manager"] = "apt"
-        elif shutil.which("yum"):
-            info["package_manager"] = "yum"
-        elif shutil.which("dnf"):
-            info["package_manager"] = "dnf"
-        else:
-            info["package_manager"] = "Unknown"
+        # Path separator
+        info["path_separator"] = os.path.sep
+
+        # Home directory
+        info["home_directory"] = str(Path.home())
+
+        # Package manager (Linux)
+        if package_manager:
+            info["package_manager"] = package_manager.result()
 
     # Root/admin privileges
-    info["is_admin"] = os.geteuid() == 0 if info["os"] != "Windows" else os.environ.get("USERNAME") == "Administrator"
+    info["is_admin"] = is_admin()
 
     return info
 
+def is_admin():
+    return os.geteuid() == 0 if platform.system() != "Windows" else os.environ.get("USERNAME") == "Administrator"
+
 def create_system_prompt():
-    base_system_prompt = (
-        "You are an expert AI system specializing in generating clean and concise code or shell commands. "
-        "Provide only the requested output in the most efficient and direct manner. "
-        "When given a task, respond exclusively with functional code or shell commands, avoiding any additional explanations, comments, or docstrings. "
-        "If task is not writing code, assume you are in the shell. "
-    )
-    
     # Gather system info
     system_info = gather_system_info()
     
@@ -123,23 +183,95 @@ def create_system_prompt():
     system_info_prompt += f"- Admin Privileges: {system_info['is_admin']}\n"
     
     # Combine base prompt with system info
-    full_prompt = base_system_prompt + system_info_prompt
+    full_prompt = PROMPT_INSTRUCTIONS + system_info_prompt
     
     return full_prompt
 
-def set_initial_conversation_history(system_prompt):
-    llm_module.conversation_history = [
-    {
-        "role": "system",
-        "content": system_prompt
+# ---------------------------- System Prompt Cache ----------------------------
+
+def system_fingerprint():
+    """
+    Cheap summary of everything the system prompt depends on. The cached
+    prompt is reused for as long as it matches.
+    """
+    parts = {
+        "prompt": PROMPT_INSTRUCTIONS,
+        "kernel": platform.release(),
+        "host": platform.node(),
+        "path": os.environ.get("PATH", ""),
+        "shell": os.environ.get("SHELL", ""),
+        "home": str(Path.home()),
+        "python": platform.python_version(),
+        "admin": is_admin(),
+        "gpu_nodes": sorted(glob.glob('/dev/nvidia[0-9]*') + glob.glob('/dev/dri/renderD*')),
+        "gputil": importlib.util.find_spec("GPUtil") is not None,
     }
-]
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def read_prompt_cache():
+    if not config.SYSTEM_PROMPT_CACHE:
+        return None
+    try:
+        with open(os.path.expanduser(config.SYSTEM_PROMPT_CACHE), encoding='utf-8') as f:
+            cached = json.load(f)
+        return cached if "fingerprint" in cached and "prompt" in cached else None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Ignoring unreadable system prompt cache: {e}")
+        return None
+
+def write_prompt_cache(fingerprint, prompt):
+    if not config.SYSTEM_PROMPT_CACHE:
+        return
+    path = os.path.expanduser(config.SYSTEM_PROMPT_CACHE)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": fingerprint, "prompt": prompt}, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"[ERROR] Could not write system prompt cache {path}: {e}")
+
+def apply_system_prompt(system_prompt):
+    global base_system_prompt
+    base_system_prompt = system_prompt
+    llm_module.set_system_prompt(system_prompt)
+
+def load_system_prompt():
+    """
+    Use the cached system prompt when the fingerprint still matches.
+    Otherwise regenerate it in the background, using the stale prompt (or
+    the instructions alone) until the new one is ready.
+    """
+    start = time.perf_counter()
+    fingerprint = system_fingerprint()
+    cached = read_prompt_cache()
+    if cached and cached["fingerprint"] == fingerprint:
+        apply_system_prompt(cached["prompt"])
+        print(f"System prompt: cached (warm start), {(time.perf_counter() - start) * 1000:.1f} ms")
+        return
+    apply_system_prompt(cached["prompt"] if cached else PROMPT_INSTRUCTIONS)
+    reason = "fingerprint changed" if cached else "cold start"
+    threading.Thread(target=regenerate_system_prompt, args=(fingerprint, start, reason), daemon=True).start()
+
+def regenerate_system_prompt(fingerprint, start, reason):
+    system_prompt = create_system_prompt()
+    write_prompt_cache(fingerprint, system_prompt)
+    apply_system_prompt(system_prompt)
+    print(f"System prompt: regenerated ({reason}) in {time.perf_counter() - start:.2f}s, "
+          f"ready {time.perf_counter() - startup_time:.2f}s after launch")
+
+def set_initial_conversation_history(system_prompt):
+    llm_module.reset_history(system_prompt)
 
 def on_activate_start(comm):
+    hotkey_times["start"] = time.perf_counter()
     print("Hotkey Cmd+Shift pressed.")
     comm.start_transcription.emit()
 
 def on_activate_stop(comm):
+    hotkey_times["stop"] = time.perf_counter()
     print("Hotkey Cmd+Ctrl pressed.")
     comm.stop_transcription.emit()
 
@@ -179,16 +311,18 @@ def hotkey_listener(comm):
 def listen():
     """
     Slot to handle starting transcription.
-    Runs in the main thread (PyQt event loop), so starts recording in a separate thread.
+    Runs in the main thread (PyQt event loop); a new pipeline job does the
+    recording and cancels the answer of an earlier utterance still in flight.
     """
+    tracer.start_trace()
     try:
         print("Starting transcription...")
         flags = Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.WindowDoesNotAcceptFocus
         stt_module.window.setWindowFlags(stt_module.window.windowFlags() | flags)
         stt_module.window.show()  # Show the PyQt floating window
 
-        # Start recording in a separate thread
-        stt_module.start_record_and_transcription()
+        cancel_speculation()
+        pipeline.start()
     except Exception as e:
         print(f"[ERROR] Exception in listen: {e}")
 
@@ -196,82 +330,297 @@ def stop_listen():
     """
     Slot to handle stopping transcription.
     """
-    global query
+    print("Stopping transcription...")
+    pipeline.stop()
+
+# ---------------------------- Pipeline Stages ----------------------------
+
+def start_capture(job):
+    """Pipeline stage: start recording (once the previous recording has stopped)."""
+    stt_module.start_record_and_transcription()
+    if config.LLM_SPECULATIVE:
+        threading.Thread(target=speculation_watcher, daemon=True).start()
+    # Hotkey press until recording was started (includes the Qt signal hop)
+    tracer.record("hotkey.start", time.perf_counter() - hotkey_times.pop("start", time.perf_counter()))
+
+def finish_capture(job):
+    """
+    Pipeline stage: stop recording and return the final transcription. A
+    cancelled job only releases the microphone; its final pass is skipped.
+    """
+    query = ''
     try:
-        print("Stopping transcription...")
-        stt_module.stop_record_and_transcription()
-        stt_module.window.hide()  # Hide the PyQt floating window
+        with tracer.span("stt.stop"):
+            stt_module.stop_record_and_transcription(final_pass=not job.cancelled)
         query = stt_module.final_transcription_text
         print("Final Transcription:", query)
-        # Start LLM processing in a separate thread
-        threading.Thread(target=llm_answer, daemon=True).start()
-    except Exception as e:
-        print(f"[ERROR] Exception in stop_listen: {e}")
+        tracer.record("hotkey.stop", time.perf_counter() - hotkey_times.get("stop", time.perf_counter()))
+        return query
+    finally:
+        # With streaming, answer_query hides the window once the answer is
+        # done; it never runs for an empty transcript or a failed capture.
+        # A cancelled job leaves the window to the recording that replaced it.
+        if communicator and not job.cancelled and (not config.LLM_STREAMING or not query):
+            communicator.hide_window.emit()  # Hide the PyQt floating window
 
-def add_buffer(input_string):
+def split_buffer(input_string):
     """
-    If the input string starts with the word 'buffer', remove 'buffer' from the beginning,
-    prepend the clipboard content, and return the resulting string.
-    Otherwise, return the input string unchanged.
+    Split the input string into (clipboard content, spoken text). The clipboard
+    content is None unless the input string starts with the word 'buffer'.
     """
-    print('Input string: ', input_string)
     input_string = input_string.lstrip()
     # Check if the string starts with 'buffer' (case-insensitive) considering punctuation
     if input_string.lower().startswith('buffer'):
-        print('Using clipboard content.')
-        # Get clipboard content
-        clipboard_content = pyperclip.paste()
-
         # Remove 'buffer' (ignoring punctuation or extra spaces after it)
-        input_string = input_string[6:].lstrip()
+        import pyperclip
+        return pyperclip.paste(), input_string[6:].lstrip()
+    return None, input_string
 
-        # Concatenate clipboard content with the modified input string
-        return clipboard_content + '\n\n' + input_string
+def clipboard_text(clipboard_content, input_string, stats=None):
+    """
+    The clipboard context for a request (None without clipboard content),
+    cut down to config.CLIPBOARD_TOKEN_BUDGET and replaced by a short note if
+    the model already has it from earlier in the conversation.
+    """
+    if clipboard_content is None:
+        return None
+    stats = {} if stats is None else stats
+    if llm_memory:
+        with llm_module.history_lock:
+            history = list(llm_module.conversation_history)
     else:
+        history = []
+    context = clipboard_context.prepare(clipboard_content, input_string, history, stats)
+    print(f"Clipboard context: {stats['clipboard_tokens']} -> {stats['context_tokens']} tokens"
+          + (f" ({stats['chunks_kept']} of {stats['chunks']} chunks)" if 'chunks' in stats else '')
+          + (" (unchanged, not resent)" if stats.get('clipboard_unchanged') else '')
+          + f" in {stats['clipboard_ms']:.1f} ms")
+    return context
+
+def join_buffer(context, input_string):
+    """Prepend the clipboard context (if any) to the spoken text."""
+    if context is None:
         print('Clipboard not used.')
+        return input_string
+    print('Using clipboard content.')
+    return context + '\n\n' + input_string
 
-    # If the string does not start with 'buffer', return it as is
-    return input_string
-
-
-def llm_answer():
+def fast_path_answer(clipboard_content, input_string):
+    """
+    Answer from the local command index if it matches the query with high
+    confidence. Only plain queries without memory or clipboard context qualify.
     """
-    Processes the transcription using the LLM module.
+    if command_index is None or llm_memory or clipboard_content is not None:
+        return None
+    start = time.perf_counter()
+    score, answer = command_index.match(input_string)
+    if score < config.COMMAND_INDEX_THRESHOLD:
+        return None
+    print(f"Command index match (score {score:.2f}) in {(time.perf_counter() - start) * 1000:.1f} ms.")
+    return answer
+
+def remember_answer(clipboard_content, input_string, answer):
+    """Add an LLM answer to the local command index."""
+    if command_index is not None and not llm_memory and clipboard_content is None:
+        command_index.add(input_string, answer)
+
+def cache_key(clipboard_content, input_string):
+    """Response cache key for a query, or None when the cache does not apply."""
+    if response_cache is None or llm_memory:
+        return None
+    return response_cache.key(input_string, base_system_prompt, clipboard_content)
+
+
+def speculative_messages(request):
+    """The messages answer_query would send for this request right now."""
+    if llm_memory:
+        with llm_module.history_lock:
+            history = list(llm_module.conversation_history)
+    else:
+        history = [llm_module.system_message]
+    return history + [{"role": "user", "content": request}]
+
+def speculate(transcript):
+    """Start a speculative LLM request for the live transcript, replacing an outdated one."""
+    global speculation
+    with speculation_lock:
+        if speculation is not None and speculation[0] == transcript:
+            return
+    if "cancel" in transcript.lower() or len(transcript) < 10:
+        cancel_speculation()
+        return
+    clipboard_content, spoken = split_buffer(transcript)
+    key = cache_key(clipboard_content, spoken)
+    if key is not None and response_cache.contains(key):
+        return  # answered from the cache on stop
+    if fast_path_answer(clipboard_content, spoken) is not None:
+        return  # answered from the command index on stop
+    context = clipboard_text(clipboard_content, spoken)
+    request = join_buffer(context, spoken)
+    with speculation_lock:
+        if speculation is not None:
+            speculation[1].cancel()
+        print("Speculative LLM request for:", transcript)
+        speculation = (transcript, llm_module.SpeculativeResponse(request, speculative_messages(request)),
+                       speculation_key(context, spoken))
+
+def cancel_speculation():
+    global speculation
+    with speculation_lock:
+        if speculation is not None:
+            speculation[1].cancel()
+            speculation = None
+
+def speculation_key(context, spoken):
+    """
+    What a speculative request must share with the final query to be used:
+    the clipboard context exactly, the spoken words up to case and
+    punctuation (the live transcript comes from the smaller partial model).
+    """
+    return context, normalize_query(spoken)
+
+def take_speculation(context, spoken):
+    """Return the speculative response if it was made for this request, cancel it otherwise."""
+    global speculation
+    with speculation_lock:
+        current, speculation = speculation, None
+    if current is None:
+        return None
+    _, response, key = current
+    if key != speculation_key(context, spoken) or response.cancelled:
+        print("Speculative LLM request discarded (query changed).")
+        response.cancel()
+        return None
+    return response
+
+def speculation_watcher():
+    """
+    While recording, start a speculative LLM request once no new speech has
+    arrived for config.LLM_SPECULATE_AFTER seconds and the live transcript
+    covers everything said so far.
     """
-    global query
-    if not llm_memory: 
+    last_voiced = -1
+    last_checked = None  # transcript speculate() last looked at
+    stable_since = time.time()
+    while stt_module.continue_recording:
+        voiced = stt_module.voice_activity.voiced_samples
+        if voiced != last_voiced:
+            last_voiced = voiced
+            stable_since = time.time()
+        elif (time.time() - stable_since >= config.LLM_SPECULATE_AFTER
+                and stt_module.streamer.voiced_at_pass == voiced
+                and stt_module.final_transcription_text != last_checked):
+            last_checked = stt_module.final_transcription_text
+            speculate(last_checked)
+        time.sleep(0.1)
+
+def answer_query(job):
+    """
+    Pipeline stage: answer the transcribed query. Returns the answer to paste,
+    or None if there is nothing to paste or the job was superseded.
+    """
+    if not llm_memory:
         set_initial_conversation_history(base_system_prompt)
 
+    query = job.query
     try:
         if "cancel" in query.lower():
+            cancel_speculation()
             print('Query canceled.')
         elif len(query)>=10:
-            query = add_buffer(query)
+            print('Input string: ', query)
+            with tracer.span("buffer") as span:
+                clipboard_content, spoken = split_buffer(query)
+                span['clipboard_chars'] = len(clipboard_content or '')
+                context = clipboard_text(clipboard_content, spoken, span)
+                query = join_buffer(context, spoken)
             print("Processing LLM response for query:", query)
-            answer = llm_module.get_response(query)
+            key = cache_key(clipboard_content, spoken)
+            cached = fast_path_answer(clipboard_content, spoken)
+            if cached is None and key is not None:
+                cached = response_cache.get(key)
+            response = take_speculation(context, spoken) if cached is None else None
+            if cached is not None:
+                cancel_speculation()
+                print('Answer served locally (command index or response cache).')
+                answer = cached
+                if config.LLM_STREAMING:
+                    stt_module.publish_transcript(answer)
+            elif response is not None or config.LLM_STREAMING:
+                if response is not None:
+                    print('Using the speculative LLM response.')
+                    pieces = response.stream()
+                else:
+                    pieces = llm_module.stream_response(query, job.cancel_event)
+                answer = ''
+                for piece in pieces:
+                    if job.cancelled:
+                        if response is not None:
+                            response.cancel()  # frees its server slot
+                        break
+                    answer += piece
+                    if config.LLM_STREAMING:
+                        # Show the answer in the floating window as it streams in
+                        stt_module.publish_transcript(answer)
+                if response is not None and not job.cancelled:
+                    response.adopt()
+            else:
+                answer = llm_module.get_response(query, job.cancel_event)
+            if job.cancelled:
+                print(f"Answer to '{job.query}' dropped (a newer query superseded it).")
+                return None
             print('Answer:', answer)
-
-            # Copy the answer to the clipboard
-            pyperclip.copy(answer)
-            time.sleep(0.1)  # Wait for clipboard to update
-
-            # paste (Ctrl + V)
-            kb_controller.press(Key.shift)
-            kb_controller.press(Key.ctrl)
-            kb_controller.press('v')
-            kb_controller.release('v')
-            kb_controller.release(Key.ctrl)
-            kb_controller.release(Key.shift)
+            source = "local" if cached is not None else "speculative" if response is not None else "llm"
+            if cached is None:
+                timings = llm_module.last_response_timings
+                tracer.record("llm.first_token", timings.get('first_token'), source=source)
+                tracer.record("llm.total", timings.get('total'), source=source, endpoint=timings.get('endpoint'))
+            # A stream that broke off leaves a truncated answer: paste it, but
+            # never cache or learn it
+            learn = cached is None and 'error' not in llm_module.last_response_timings
+            if learn and answer and answer != llm_module.ERROR_ANSWER:
+                if key is not None:
+                    response_cache.put(key, answer)
+                remember_answer(clipboard_content, spoken, answer)
+                if context is not None:
+                    clipboard_context.remember(clipboard_content, context)
+            job.source = source
+            return answer
         else:
+            cancel_speculation()
             print('Query is too short (under 10 characters)')
     except Exception as e:
-        print(f"[ERROR] Exception in llm_answer: {e}")
+        print(f"[ERROR] Exception in answer_query: {e}")
+    finally:
+        if config.LLM_STREAMING and communicator and not job.cancelled:
+            communicator.hide_window.emit()
+    return None
+
+def paste_answer(job):
+    """Pipeline stage: paste the answer into the focused window."""
+    with tracer.span("paste"):
+        # Copy the answer to the clipboard
+        import pyperclip
+        pyperclip.copy(job.answer)
+        time.sleep(0.1)  # Wait for clipboard to update
+
+        # paste (Ctrl + V)
+        kb_controller.press(Key.shift)
+        kb_controller.press(Key.ctrl)
+        kb_controller.press('v')
+        kb_controller.release('v')
+        kb_controller.release(Key.ctrl)
+        kb_controller.release(Key.shift)
+    # What the user waits for: stop hotkey until the answer is pasted
+    if "stop" in hotkey_times:
+        tracer.record("stop_to_paste", time.perf_counter() - hotkey_times.pop("stop"), source=job.source)
 
 def signal_handler(sig, frame):
     """
     Handle external signals like SIGINT for graceful shutdown.
     """
     print("\nGracefully shutting down...")
+    pipeline.cancel()
     stt_module.stop_record_and_transcription()
     QApplication.quit()
 
@@ -280,6 +629,7 @@ def quit_app():
     Handle the Quit action from the system tray.
     """
     print("\nQuitting application via system tray...")
+    pipeline.cancel()
     stt_module.stop_record_and_transcription()
     QApplication.quit()
 
@@ -289,8 +639,68 @@ def memory_toggled(checked):
     llm_memory = True if checked else False
     print(f"LLM memory is now {status}")
 
+def window_closed():
+    """Slot for the floating window being closed: drop the utterance in flight."""
+    print("Floating window closed, cancelling the current utterance.")
+    pipeline.cancel()
+
+def hide_window():
+    """Slot to hide the floating window once a streamed answer is done."""
+    if not stt_module.continue_recording:
+        stt_module.window.hide()
+
+def update_cache_action(action):
+    """Refresh the response cache statistics shown in the tray menu."""
+    stats = response_cache.stats
+    action.setText(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                   f"{response_cache.count()} entries")
+
+def clear_response_cache():
+    response_cache.clear()
+    print("Response cache cleared.")
+
+# ---------------------------- Startup ----------------------------
+
+def mark_startup(label):
+    if profiler is not None:
+        profiler.mark(label)
+
+def set_status(status):
+    """Slot showing the readiness state in the tray icon, its tooltip and menu."""
+    tray_icon.setIcon(app_icon if status == STATUS_READY else loading_icon)
+    tray_icon.setToolTip(f"AI Voice Assistant: {status}")
+    tray_status_action.setText(status)
+
+def preload():
+    """
+    Load the heavy parts (Whisper models, command index, LLM clients) in
+    the background once the tray is up, reporting progress to the tray.
+    """
+    communicator.status_changed.emit(STATUS_LOADING)
+    stt_module.load_model_async()
+    if command_index is not None:
+        command_index.load_async()
+    llm_module.probe_endpoints()
+    mark_startup("LLM clients ready")
+    stt_module.models_loaded.wait()
+    if stt_module.model_ready.is_set():
+        mark_startup("speech models ready")
+        communicator.status_changed.emit(STATUS_READY)
+    else:
+        communicator.status_changed.emit(STATUS_FAILED)
+    print(f"Startup finished {time.perf_counter() - startup_time:.2f}s after launch")
+    communicator.startup_finished.emit()
+
+def startup_finished():
+    """With --profile-startup, print the breakdown and quit."""
+    if profiler is not None:
+        profiler.report()
+        quit_app()
+
 def main():
-    global base_system_prompt
+    global communicator, tray_icon, tray_status_action, app_icon, loading_icon, pipeline
+    stt_module.startup_time = startup_time
+
     # Initialize the PyQt application
     app = QApplication(sys.argv)
 
@@ -300,24 +710,56 @@ def main():
     # Initialize the communicator
     communicator = Communicator()
 
+    # Each utterance runs as a job: capture -> STT -> LLM -> paste
+    pipeline = Pipeline(start_capture, finish_capture, answer_query, paste_answer,
+                        queue_size=config.PIPELINE_QUEUE_SIZE)
+
     # Connect signals to slots
     communicator.start_transcription.connect(listen)
     communicator.stop_transcription.connect(stop_listen)
+    communicator.hide_window.connect(hide_window)
+    stt_module.window.closed.connect(window_closed)
+    communicator.status_changed.connect(set_status)
+    communicator.startup_finished.connect(startup_finished)
 
     # Start the hotkey listener in a separate daemon thread
     hotkey_thread = threading.Thread(target=hotkey_listener, args=(communicator,), daemon=True)
     hotkey_thread.start()
 
     # Setup System Tray Icon
-    tray_icon = QSystemTrayIcon(QIcon("AI1b.ico"), parent=app)
+    # The icon is greyed out until the speech model is ready
+    app_icon = QIcon("AI1b.ico")
+    loading_icon = QIcon(app_icon.pixmap(64, 64, QIcon.Mode.Disabled))
+    tray_icon = QSystemTrayIcon(loading_icon, parent=app)
     tray_menu = QMenu()
 
+    # Readiness state
+    tray_status_action = QAction(STATUS_LOADING)
+    tray_status_action.setEnabled(False)
+    tray_menu.addAction(tray_status_action)
+    tray_menu.addSeparator()
+
     # LLM memory checkbox
     checkbox_action = QAction("Enable Memory")
     checkbox_action.setCheckable(True)
     checkbox_action.toggled.connect(memory_toggled)
     tray_menu.addAction(checkbox_action)
 
+    # Response cache statistics, refreshed whenever the menu opens
+    if response_cache is not None:
+        cache_stats_action = QAction("Response cache")
+        cache_stats_action.setEnabled(False)
+        tray_menu.addAction(cache_stats_action)
+        tray_menu.aboutToShow.connect(lambda: update_cache_action(cache_stats_action))
+        clear_cache_action = QAction("Clear Response Cache")
+        clear_cache_action.triggered.connect(clear_response_cache)
+        tray_menu.addAction(clear_cache_action)
+
+    # Per-endpoint latency histograms, printed to the console
+    endpoint_stats_action = QAction("Print LLM Endpoint Stats")
+    endpoint_stats_action.triggered.connect(llm_module.pool.print_stats)
+    tray_menu.addAction(endpoint_stats_action)
+
     quit_action = QAction("Quit")
     #quit_action.triggered.connect(signal_handler)
     quit_action.triggered.connect(quit_app)
@@ -325,9 +767,13 @@ def main():
     tray_menu.addAction(quit_action)
     tray_icon.setContextMenu(tray_menu)
     tray_icon.show()
+    set_status(STATUS_LOADING)
+    print(f"Time to tray: {time.perf_counter() - startup_time:.2f}s")
+    mark_startup("tray shown")
 
-    base_system_prompt = create_system_prompt()
-    set_initial_conversation_history(base_system_prompt)
+    # Load the models, the command index and the LLM clients now that the UI is up
+    load_system_prompt()
+    threading.Thread(target=preload, daemon=True).start()
 
     print("Hotkey listeners started.")
     print("Press Cmd + SHIFT to start transcription (global).")
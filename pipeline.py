@@ -0,0 +1,163 @@
+# pipeline.py
+#
+# Runs every utterance as a job through capture -> STT -> LLM -> paste on an
+# asyncio event loop that lives on its own thread next to the Qt loop.
+# The blocking stage functions run in the loop's thread pool. Starting a new
+# utterance cancels the jobs still in flight. Their LLM requests see the
+# job's cancel_event and close their connections, which frees the server
+# slots. Stale answers are never pasted. Bounded queues between the stages
+# apply backpressure instead of piling up work.
+
+import asyncio
+import itertools
+import threading
+import time
+
+class Job:
+    """One utterance, from the start hotkey to the pasted answer."""
+    _ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(Job._ids)
+        self.cancel_event = threading.Event()  # also seen by the stage threads
+        self.stopped = None                    # asyncio.Event, set by the stop hotkey
+        self.stage = "queued"
+        self.query = ''
+        self.answer = None
+        self.source = None  # where the answer came from (for tracing)
+        self.created = time.perf_counter()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+class Pipeline:
+    """
+    Stage functions are called with the job on a worker thread:
+      start_capture(job)   starts recording
+      finish_capture(job)  stops it after the stop hotkey, returns the transcript
+      answer(job)          returns the answer to paste, or None
+      paste(job)           pastes job.answer
+    Capture and STT share the microphone, so a new job starts recording only
+    once the previous recording has stopped. The methods are thread-safe.
+    """
+    def __init__(self, start_capture, finish_capture, answer, paste, queue_size=1):
+        self.start_capture = start_capture
+        self.finish_capture = finish_capture
+        self.answer = answer
+        self.paste = paste
+        self.queue_size = queue_size
+        self.jobs = []  # jobs in flight, only touched on the loop thread
+        self.stats = {'jobs': 0, 'cancelled': 0, 'pasted': 0}
+        self._paste_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pipeline", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def start(self):
+        """Cancel the jobs in flight and start capturing a new utterance."""
+        job = Job()
+        self._loop.call_soon_threadsafe(self._start, job)
+        return job
+
+    def stop(self):
+        """Stop capturing the current utterance and send it down the pipeline."""
+        self._loop.call_soon_threadsafe(self._stop)
+
+    def cancel(self):
+        """Cancel every job in flight (e.g. on quit)."""
+        self._loop.call_soon_threadsafe(self._cancel_all)
+
+    # ---------------------------- Event Loop ----------------------------
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._microphone = asyncio.Lock()
+        self._llm_queue = asyncio.Queue(self.queue_size)
+        self._paste_queue = asyncio.Queue(self.queue_size)
+        self._loop.create_task(self._worker("llm", self._llm_queue, self.answer, self._paste_queue))
+        self._loop.create_task(self._worker("paste", self._paste_queue, self._paste, None))
+        self._loop.call_soon(self._ready.set)
+        self._loop.run_forever()
+
+    def _start(self, job):
+        self._cancel_all()
+        job.stopped = asyncio.Event()
+        self.jobs.append(job)
+        self.stats['jobs'] += 1
+        self._loop.create_task(self._capture(job))
+
+    def _stop(self):
+        for job in self.jobs:
+            if job.stage in ("queued", "capture") and not job.stopped.is_set():
+                job.stopped.set()
+                return
+        print("No recording to stop.")
+
+    def _cancel_all(self):
+        for job in list(self.jobs):
+            with self._paste_lock:
+                if job.stage == "paste":
+                    continue  # already being pasted
+                job.cancel_event.set()
+            self.stats['cancelled'] += 1
+            print(f"Job {job.id} cancelled during {job.stage} (superseded).")
+            job.stopped.set()  # lets a running capture stop
+            if job.stage not in ("capture", "stt"):
+                self._finish(job)  # otherwise _capture finishes it once the microphone is released
+
+    def _finish(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+
+    async def _capture(self, job):
+        async with self._microphone:  # the previous recording must be stopped first
+            if job.cancelled:
+                self._finish(job)
+                return
+            job.stage = "capture"
+            try:
+                await self._loop.run_in_executor(None, self.start_capture, job)
+                await job.stopped.wait()
+                job.stage = "stt"
+                # Runs for cancelled jobs too: it releases the microphone
+                job.query = await self._loop.run_in_executor(None, self.finish_capture, job)
+            except Exception as e:
+                print(f"[ERROR] Pipeline stage {job.stage} failed: {e}")
+                self._finish(job)
+                return
+        if job.cancelled or not job.query:
+            self._finish(job)
+            return
+        job.stage = "queued"
+        await self._llm_queue.put(job)  # waits while the LLM stage is backed up
+
+    async def _worker(self, stage, source, function, target):
+        while True:
+            job = await source.get()
+            if job.cancelled:
+                continue
+            job.stage = stage
+            try:
+                result = await self._loop.run_in_executor(None, function, job)
+            except Exception as e:
+                print(f"[ERROR] Pipeline stage {stage} failed: {e}")
+                result = None
+            if target is None or job.cancelled or result is None:
+                self._finish(job)
+                continue
+            job.answer = result
+            job.stage = "queued"
+            await target.put(job)
+
+    def _paste(self, job):
+        # The last point a newer utterance can still stop a stale answer
+        with self._paste_lock:
+            if job.cancelled:
+                return None
+            job.stage = "paste"
+        self.paste(job)
+        self.stats['pasted'] += 1
+        return True
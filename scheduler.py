@@ -0,0 +1,166 @@
+# scheduler.py
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+FINAL = 0
+PARTIAL = 1
+
+class InferenceScheduler:
+    """
+    Single worker thread shared by every transcription job.
+
+    Final jobs always run before partial ones and in submission order. Only
+    the newest partial job is kept: submitting a partial job replaces the
+    pending one, and submitting a final job drops it and raises
+    `partial_cancelled` so a running partial pass can stop early.
+    """
+    def __init__(self, name="inference"):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pending_partial = None
+        self._running = None
+        self.partial_cancelled = threading.Event()
+        self.stats = {'partial': 0, 'final': 0, 'replaced': 0, 'preempted': 0}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit_partial(self, fn, *args):
+        """Queue a partial job. Returns True if it replaced a pending one."""
+        with self._cond:
+            self.stats['partial'] += 1
+            replaced = self._drop_pending_partial()
+            if replaced:
+                self.stats['replaced'] += 1
+            entry = [PARTIAL, next(self._seq), Future(), fn, args]
+            self._pending_partial = entry
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+            return replaced
+
+    def submit_final(self, fn, *args):
+        """Queue a final job ahead of all partial work and return its Future."""
+        with self._cond:
+            self.stats['final'] += 1
+            if self._drop_pending_partial():
+                self.stats['preempted'] += 1
+            if self._running == PARTIAL:
+                self.partial_cancelled.set()
+                self.stats['preempted'] += 1
+            entry = [FINAL, next(self._seq), Future(), fn, args]
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+            return entry[2]
+
+    def cancel_partials(self):
+        """Drop pending partial work and ask a running partial job to stop."""
+        with self._cond:
+            self._drop_pending_partial()
+            if self._running == PARTIAL:
+                self.partial_cancelled.set()
+
+    def _drop_pending_partial(self):
+        entry = self._pending_partial
+        self._pending_partial = None
+        if entry is None or entry[3] is None:
+            return False
+        entry[2].cancel()
+        entry[3] = None  # left in the heap, skipped when popped
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                priority, _, future, fn, args = heapq.heappop(self._heap)
+                if fn is None:
+                    continue
+                if priority == PARTIAL:
+                    self._pending_partial = None
+                    self.partial_cancelled.clear()
+                self._running = priority
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    print(f"[ERROR] Exception in inference job {getattr(fn, '__name__', fn)}: {e}")
+                    future.set_exception(e)
+
+            with self._cond:
+                self._running = None
+
+class BatchScheduler:
+    """
+    Single worker thread running jobs from many clients in batches.
+
+    `run_batch(items, final)` gets a list of items of one kind and returns
+    their results in order. Final items run first, in submission order. Per
+    key only the newest pending partial item is kept. The worker waits
+    `gather` seconds for concurrent submissions before taking up to
+    `max_batch` items.
+    """
+    def __init__(self, run_batch, max_batch=8, gather=0.01, name="batch-inference"):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.gather = gather
+        self._finals = []     # [Future, item]
+        self._partials = {}   # key -> [Future, item], in submission order
+        self._cond = threading.Condition()
+        self.stats = {'batches': 0, 'items': 0, 'largest': 0, 'replaced': 0}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, item, final=False):
+        """Queue an item and return the Future of its result."""
+        future = Future()
+        with self._cond:
+            if final:
+                self._finals.append([future, item])
+            else:
+                previous = self._partials.pop(key, None)
+                if previous is not None:
+                    previous[0].cancel()
+                    self.stats['replaced'] += 1
+                self._partials[key] = [future, item]
+            self._cond.notify()
+        return future
+
+    def _take(self):
+        with self._cond:
+            final = bool(self._finals)
+            if final:
+                batch, self._finals = self._finals[:self.max_batch], self._finals[self.max_batch:]
+            else:
+                keys = list(self._partials)[:self.max_batch]
+                batch = [self._partials.pop(key) for key in keys]
+        return final, [entry for entry in batch if entry[0].set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._finals and not self._partials:
+                    self._cond.wait()
+                waiting = len(self._finals) + len(self._partials)
+            if waiting < self.max_batch and self.gather:
+                time.sleep(self.gather)  # let concurrent sessions join the batch
+
+            final, batch = self._take()
+            if not batch:
+                continue
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+            self.stats['largest'] = max(self.stats['largest'], len(batch))
+            try:
+                results = self.run_batch([item for _, item in batch], final)
+                for (future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                print(f"[ERROR] Exception in batch job: {e}")
+                for future, _ in batch:
+                    future.set_exception(e)
@@ -0,0 +1,69 @@
+# startup_profile.py
+#
+# Import-time and startup-phase profiler behind main.py --profile-startup.
+# It has to be imported before anything heavy, so it only uses the stdlib.
+
+import builtins
+import sys
+import threading
+import time
+
+class StartupProfiler:
+    """
+    Times every first-time import (cumulative and self time, per thread so
+    the background preloaders are measured too) and named startup phases.
+    """
+    def __init__(self, start):
+        self.start = start
+        self.imports = {}   # module name -> [cumulative, self, thread name]
+        self.phases = []    # (label, seconds since start)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                entry = self.imports.setdefault(name, [0.0, 0.0, threading.current_thread().name])
+                entry[0] += elapsed
+                entry[1] += elapsed - children
+
+    def mark(self, label):
+        """Record that a startup phase finished now."""
+        with self._lock:
+            self.phases.append((label, time.perf_counter() - self.start))
+
+    def report(self, top=25):
+        with self._lock:
+            phases = list(self.phases)
+            imports = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)
+        print("\nStartup phases (seconds since launch):")
+        for label, at in phases:
+            print(f"  {at:8.3f}  {label}")
+        print(f"\nSlowest imports (top {top} by cumulative time):")
+        print(f"  {'cumulative':>10} {'self':>8}  {'thread':<16} module")
+        for name, (cumulative, own, thread) in imports[:top]:
+            print(f"  {cumulative * 1000:8.1f}ms {own * 1000:6.1f}ms  {thread:<16} {name}")
@@ -0,0 +1,288 @@
+# stt_daemon.py
+#
+# Headless speech-to-text daemon. Loads the Whisper models once and serves
+# any number of clients (editors, terminals, other desktop sessions) over a
+# Unix socket, or localhost TCP where Unix sockets are unavailable.
+# Transcription windows of all clients are batched onto the shared models.
+#
+#   python stt_daemon.py serve
+#   python stt_daemon.py send recording.wav
+#
+# Protocol: the client sends one JSON header line ({"sample_rate": 48000,
+# "channels": 2}, 16 kHz mono by default), then interleaved int16 PCM in
+# length-prefixed frames (4-byte big-endian length, then the bytes) and a
+# zero-length frame once it is done. Other formats are converted to 16 kHz
+# mono by the daemon. It answers with JSON lines:
+#   {"type": "partial", "text": ...}            live transcript
+#   {"type": "segment", "index": n, "text": ...} a finished segment
+#   {"type": "final", "text": ...}              full transcript, then close
+#   {"type": "error", "message": ...}
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import wave
+import numpy as np
+import config
+import stt_module
+from audio_buffer import AudioRingBuffer
+from vad import EnergyVAD, StreamingVAD, PauseSegmenter
+from scheduler import BatchScheduler
+from resampler import StreamingResampler
+
+SAMPLE_RATE = stt_module.SAMPLE_RATE
+MAX_FRAME_BYTES = 4 * 1024 * 1024  # over 20 s of 48 kHz stereo; larger frames are rejected
+
+def run_batch(items, final):
+    """BatchScheduler callback: decode (window, prompt) items on the shared model."""
+    windows, prompts = zip(*items)
+    tier = stt_module.FINAL_TIER if final else stt_module.PARTIAL_TIER
+    return stt_module.transcribe_batch(list(windows), list(prompts), tier)
+
+batcher = BatchScheduler(run_batch, max_batch=config.DAEMON_MAX_BATCH, gather=config.DAEMON_BATCH_WAIT)
+
+# ---------------------------- Client Sessions ----------------------------
+
+class Session:
+    """
+    One client's audio stream. Speech is cut into segments at pauses (the
+    same VAD and segmenter as the microphone path). Closed segments are
+    queued as final jobs; the open segment gets a partial job whenever new
+    speech arrived and DAEMON_PARTIAL_INTERVAL has passed.
+    """
+    def __init__(self, send):
+        self.send = send
+        self.buffer = AudioRingBuffer(int((stt_module.SEGMENT_MAX_LENGTH + 10) * SAMPLE_RATE))
+        self.voice = StreamingVAD(EnergyVAD(frame_size=stt_module.SAMPLE_SIZE), sample_rate=SAMPLE_RATE,
+                                  speech_pad=stt_module.SPEECH_PAD)
+        self.segmenter = PauseSegmenter(
+            sample_rate=SAMPLE_RATE,
+            frame_size=stt_module.SAMPLE_SIZE,
+            min_pause=stt_module.SEGMENT_MIN_PAUSE,
+            min_segment=stt_module.SEGMENT_MIN_LENGTH,
+            max_segment=stt_module.SEGMENT_MAX_LENGTH
+        )
+        self.segment_start = 0
+        self.segments = []   # Futures of the closed segments' texts, in order
+        self.voiced_at_partial = 0
+        self.last_partial = 0.0
+
+    def feed(self, samples):
+        self.buffer.write(samples)
+        for boundary, had_speech in self.segmenter.process(self.voice.process(samples)):
+            self.close_segment(boundary, had_speech)
+        now = time.monotonic()
+        if (self.voice.voiced_samples > self.voiced_at_partial
+                and now - self.last_partial >= config.DAEMON_PARTIAL_INTERVAL):
+            self.voiced_at_partial = self.voice.voiced_samples
+            self.last_partial = now
+            self.request_partial()
+
+    def speech(self, start, end):
+        """Voiced audio of [start, end) as float32."""
+        parts = [self.buffer.float_window(s, e) for s, e in self.voice.speech_regions(start, end)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def finished_text(self):
+        """Text of the leading segments that are already transcribed."""
+        texts = []
+        for future in self.segments:
+            if not future.done() or future.exception() is not None:
+                break
+            texts.append(future.result())
+        return ' '.join(text for text in texts if text)
+
+    def request_partial(self):
+        window = self.speech(self.segment_start, self.buffer.end)
+        if len(window) == 0:
+            return
+        segment = len(self.segments)
+        prompt = self.finished_text()[-stt_module.STREAM_PROMPT_CHARS:]
+        future = batcher.submit(self, (window, prompt), final=False)
+        future.add_done_callback(lambda f: self.on_partial(f, segment))
+
+    def on_partial(self, future, segment):
+        if future.cancelled() or future.exception() is not None or segment != len(self.segments):
+            return  # replaced by a newer pass, or its segment was closed meanwhile
+        self.send({"type": "partial", "text": ' '.join(filter(None, (self.finished_text(), future.result())))})
+
+    def close_segment(self, end, had_speech):
+        window = self.speech(self.segment_start, end) if had_speech else np.zeros(0, dtype=np.float32)
+        if len(window) > 0:
+            index = len(self.segments)
+            prompt = self.finished_text()[-stt_module.STREAM_PROMPT_CHARS:]
+            future = batcher.submit(self, (window, prompt), final=True)
+            future.add_done_callback(lambda f: self.on_segment(f, index))
+            self.segments.append(future)
+        self.segment_start = end
+        self.buffer.discard_until(end)
+        self.voice.discard_until(end)
+
+    def on_segment(self, future, index):
+        if future.exception() is None:
+            self.send({"type": "segment", "index": index, "text": future.result()})
+
+    def finish(self):
+        """Transcribe the open segment and send the full transcript."""
+        self.close_segment(self.buffer.end, had_speech=True)
+        texts = []
+        for future in self.segments:
+            try:
+                texts.append(future.result())
+            except Exception as e:
+                self.send({"type": "error", "message": f"Transcription failed: {e}"})
+        self.send({"type": "final", "text": ' '.join(text for text in texts if text)})
+
+class Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.send_lock = threading.Lock()
+        self.connected = True
+
+    def send(self, message):
+        """Write a JSON line (called from the batch worker too)."""
+        if not self.connected:
+            return
+        try:
+            with self.send_lock:
+                self.wfile.write(json.dumps(message).encode() + b'\n')
+                self.wfile.flush()
+        except OSError:
+            self.connected = False
+
+    def handle(self):
+        try:
+            header = json.loads(self.rfile.readline() or b'{}')
+        except ValueError:
+            self.send({"type": "error", "message": "Expected a JSON header line"})
+            return
+        if not isinstance(header, dict):
+            self.send({"type": "error", "message": "Expected a JSON object as the header"})
+            return
+        rate, channels = header.get("sample_rate", SAMPLE_RATE), header.get("channels", 1)
+        if not (isinstance(rate, int) and isinstance(channels, int) and 0 < rate <= 384000 and 0 < channels <= 32):
+            self.send({"type": "error", "message": "Expected an integer sample_rate and channels"})
+            return
+        resampler = StreamingResampler(rate, SAMPLE_RATE, channels)
+
+        session = Session(self.send)
+        start = time.perf_counter()
+        received = 0
+        while True:
+            size = self.rfile.read(4)
+            if len(size) < 4:
+                self.connected = False  # client went away without finishing
+                return
+            size = struct.unpack('>I', size)[0]
+            if size == 0:
+                break
+            if size > MAX_FRAME_BYTES:
+                self.send({"type": "error", "message": f"Frames are limited to {MAX_FRAME_BYTES} bytes"})
+                self.connected = False
+                return
+            data = self.rfile.read(size)
+            samples = resampler.process(np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16))
+            received += len(samples)
+            session.feed(samples)
+        session.finish()
+        print(f"Session done: {received / SAMPLE_RATE:.1f}s of audio in {time.perf_counter() - start:.1f}s, "
+              f"batch stats {batcher.stats}")
+
+# ---------------------------- Server ----------------------------
+
+def socket_address():
+    """Unix socket path, or ("127.0.0.1", port) where Unix sockets are unavailable."""
+    if config.DAEMON_TCP_PORT or not hasattr(socket, 'AF_UNIX'):
+        return ("127.0.0.1", config.DAEMON_TCP_PORT or 8765)
+    return os.path.expanduser(config.DAEMON_SOCKET)
+
+def serve():
+    address = socket_address()
+    print("Loading Whisper models...")
+    stt_module.load_model(stt_module.PARTIAL_TIER)
+    stt_module.load_model(stt_module.FINAL_TIER)
+
+    if isinstance(address, str):
+        os.makedirs(os.path.dirname(address), mode=0o700, exist_ok=True)
+        if os.path.exists(address):
+            os.unlink(address)  # stale socket from an earlier run
+        # The socket is created owner-only, with no window where others can connect
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(address, Handler)
+        finally:
+            os.umask(umask)
+    else:
+        server = socketserver.ThreadingTCPServer(address, Handler)
+    server.daemon_threads = True
+    print(f"STT daemon listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+
+# ---------------------------- Client ----------------------------
+
+def connect():
+    address = socket_address()
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+def send_wav(path, speed=1.0, frame_seconds=0.1):
+    """Stream a 16-bit WAV file (any rate and channel count) to the daemon and print its answers."""
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise SystemExit(f"{path}: expected 16-bit PCM")
+        rate, channels = f.getframerate(), f.getnchannels()
+        pcm = f.readframes(f.getnframes())
+
+    sock = connect()
+    sock.sendall(json.dumps({"sample_rate": rate, "channels": channels}).encode() + b'\n')
+
+    def sender():
+        frame_bytes = int(frame_seconds * rate) * channels * 2
+        for offset in range(0, len(pcm), frame_bytes):
+            frame = pcm[offset:offset + frame_bytes]
+            sock.sendall(struct.pack('>I', len(frame)) + frame)
+            if speed:
+                time.sleep(frame_seconds / speed)
+        sock.sendall(struct.pack('>I', 0))
+
+    threading.Thread(target=sender, daemon=True).start()
+    start = time.perf_counter()
+    with sock.makefile('rb') as replies:
+        for line in replies:
+            message = json.loads(line)
+            print(f"[{time.perf_counter() - start:6.2f}s] {message['type']}: "
+                  f"{message.get('text', message.get('message', ''))}")
+            if message["type"] == "final":
+                break
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless speech-to-text daemon")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="load the models and serve clients")
+    send = commands.add_parser("send", help="stream a WAV file to a running daemon")
+    send.add_argument("wav")
+    send.add_argument("--speed", type=float, default=1.0, help="0 sends as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve()
+    else:
+        send_wav(args.wav, args.speed)
+
+if __name__ == "__main__":
+    main()
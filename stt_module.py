@@ -1,30 +1,54 @@
 # stt_module.py
 
-import torch
-torch.set_num_threads(1)
 import time
 import numpy as np
-import pyaudio
 import threading
 import queue
-from faster_whisper import WhisperModel
-from PyQt6.QtWidgets import QLabel, QWidget
-from PyQt6.QtCore import Qt, QTimer
+import config
+from audio_buffer import AudioRingBuffer
+from vad import EnergyVAD, StreamingVAD, PauseSegmenter
+from scheduler import InferenceScheduler
+from resampler import StreamingResampler
+from tracing import tracer
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None  # only needed for microphone capture, not by the daemon
 
 # Audio Configuration
-FORMAT = pyaudio.paInt16
+FORMAT = pyaudio.paInt16 if pyaudio else None
 CHANNELS = 1
 SAMPLE_RATE = 16000
 CHUNK = int(SAMPLE_RATE / 10)
 SAMPLE_SIZE = 512
 
-# Initialize Whisper Model
-model_size = "Systran/faster-distil-whisper-medium.en"
-faster_whisper_model = WhisperModel(model_size, device="cuda", compute_type="bfloat16")
+# Whisper models, loaded in the background by load_model_async(). Live
+# partial passes use the small partial-tier model, segment and stop passes
+# use the accurate final-tier model. Both share one InferenceScheduler, so
+# final work always runs ahead of pending partial work.
+PARTIAL_TIER = "partial"
+FINAL_TIER = "final"
+models = {}                 # model name -> WhisperModel
+faster_whisper_model = None # the final-tier model once loaded
+model_ready = threading.Event()
+models_loaded = threading.Event()  # set once load_model_async() is done, even on failure
+model_lock = threading.Lock()
+model_load_errors = {}
+model_timings = {}
+scheduler = InferenceScheduler()
+startup_time = time.perf_counter()  # main.py resets this to its own start
+first_transcript_reported = False
 
 # Shared resources
-transcription_queue = queue.Queue()
+# Transcript updates and window states are passed to these callbacks from
+# the recording and inference threads (the floating window forwards them
+# to the GUI thread through Qt signals)
+transcript_listeners = []
+state_listeners = []
+WINDOW_ACTIVE = "active"    # recording, or waiting for the final pass
+WINDOW_DONE = "done"        # final transcription completed
 stop_event = threading.Event()
+skip_final_pass = False  # set when the utterance was cancelled: its transcript is not needed
 continue_recording = False
 recording_thread = None
 audio = None
@@ -34,10 +58,263 @@ cumulative_transcription_time = 0
 recording_time_limit = 30.0
 temp_transcription_length = 0
 
+# Streaming transcription: each pass decodes only the audio after the last
+# committed word, so the window (and the decode cost) stays bounded.
+STREAM_MAX_WINDOW = 15.0   # seconds of uncommitted audio before forcing a commit
+STREAM_KEEP_TAIL = 5.0     # seconds kept uncommitted when a commit is forced
+STREAM_PROMPT_CHARS = 200  # committed text passed back to Whisper as context
+
+# Capture/inference pipeline: the PyAudio callback only enqueues raw chunks,
+# the recording thread appends them to the buffer and the scheduler thread
+# transcribes the newest audio.
+AUDIO_QUEUE_SECONDS = 5.0
+audio_queue = queue.Queue(maxsize=int(AUDIO_QUEUE_SECONDS * SAMPLE_RATE / SAMPLE_SIZE))
+capture_stats = {}
+# Downmixes and resamples device audio to 16 kHz mono (see input_format)
+capture_resampler = StreamingResampler(SAMPLE_RATE, SAMPLE_RATE, CHANNELS)
+
+# Streaming VAD: every captured frame is classified once as it arrives.
+# Partial passes only run when new voiced frames came in, and with
+# VAD_PREFILTER the decoder is fed just the padded speech regions instead of
+# re-running Whisper's own VAD over the window.
+VAD_PREFILTER = True
+SPEECH_PAD = 0.4            # seconds of context kept around voiced frames
+voice_activity = StreamingVAD(EnergyVAD(frame_size=SAMPLE_SIZE), sample_rate=SAMPLE_RATE, speech_pad=SPEECH_PAD)
+
+# Long-form dictation: the recording is split at pauses into independent
+# segments. Closed segments are transcribed in the background while the user
+# keeps talking and their audio is discarded once transcribed, so neither
+# memory nor stop-to-text latency grows with the length of the dictation.
+# With long-form dictation off, recording stops at recording_time_limit.
+LONG_FORM_DICTATION = True
+SEGMENT_MIN_PAUSE = 0.6     # seconds of silence that end a segment
+SEGMENT_MIN_LENGTH = 2.0    # shorter segments are not split off
+SEGMENT_MAX_LENGTH = 25.0   # longer segments are cut at the quietest frame
+segmenter = PauseSegmenter(
+    sample_rate=SAMPLE_RATE,
+    frame_size=SAMPLE_SIZE,
+    min_pause=SEGMENT_MIN_PAUSE,
+    min_segment=SEGMENT_MIN_LENGTH,
+    max_segment=SEGMENT_MAX_LENGTH
+)
+finished_segments = []              # text of transcribed segments, in order
+open_segment_start = 0
+
+# Incremental final pass: on stop, the text the partial passes already have
+# is reused and only the audio after the last committed word is decoded. If
+# no speech arrived after the last partial pass, nothing is decoded at all.
+# When the partial passes use a smaller model, their text is not reused;
+# instead the final model decodes the open segment up to each short pause in
+# the background (pause passes), and the stop pass only decodes the speech
+# after the last one. Pieces shorter than PAUSE_PASS_MIN_LENGTH are left for
+# the next pass, since Whisper is less accurate on very short clips.
+INCREMENTAL_FINAL_PASS = True
+PAUSE_PASS_MIN_PAUSE = 0.3   # seconds of silence that trigger a pause pass
+PAUSE_PASS_MIN_LENGTH = 1.0  # seconds of audio a pause pass decodes at least
+pause_segmenter = PauseSegmenter(
+    sample_rate=SAMPLE_RATE,
+    frame_size=SAMPLE_SIZE,
+    min_pause=PAUSE_PASS_MIN_PAUSE,
+    min_segment=PAUSE_PASS_MIN_LENGTH,
+    max_segment=SEGMENT_MAX_LENGTH
+)
+final_prefix_text = ''   # final-model text of the open segment up to final_prefix_until
+final_prefix_until = 0
+
+# Recorded audio lives in a preallocated int16 ring buffer; the transcriber
+# gets float32 copies of just the window it decodes.
+AUDIO_BUFFER_SECONDS = max(recording_time_limit, 2 * SEGMENT_MAX_LENGTH) + 10.0
+audio_buffer = AudioRingBuffer(int(AUDIO_BUFFER_SECONDS * SAMPLE_RATE))
+
+# ---------------------------- Model Loading ----------------------------
+
+# Set once a model failed to load on CUDA (e.g. cuDNN or cuBLAS missing), so
+# "auto" goes straight to the CPU for the other tier
+cuda_failed = False
+
+def resolve_device():
+    if config.WHISPER_DEVICE != "auto":
+        return config.WHISPER_DEVICE
+    if cuda_failed:
+        return "cpu"
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda"
+    except Exception:
+        pass
+    return "cpu"
+
+def resolve_compute_type(device):
+    if config.WHISPER_COMPUTE_TYPE != "auto" and not (device == "cpu" and cuda_failed):
+        return config.WHISPER_COMPUTE_TYPE
+    if device != "cuda":
+        return "int8"
+    # Not bfloat16: GPUs older than Ampere reject it
+    try:
+        import ctranslate2
+        supported = ctranslate2.get_supported_compute_types("cuda")
+    except Exception:
+        return "default"
+    for compute_type in ("float16", "int8_float16"):
+        if compute_type in supported:
+            return compute_type
+    return "default"
+
+def warm_up_model(model):
+    """Decode a second of silence so buffers and kernels are ready."""
+    segments, _ = model.transcribe(
+        np.zeros(SAMPLE_RATE, dtype=np.float32),
+        language='en',
+        vad_filter=False,
+        without_timestamps=True
+    )
+    list(segments)
+
+def model_name(tier):
+    if tier == PARTIAL_TIER and config.WHISPER_PARTIAL_MODEL:
+        return config.WHISPER_PARTIAL_MODEL
+    return config.WHISPER_MODEL
+
+def import_whisper():
+    """
+    Import torch and faster_whisper on first use instead of at startup; they
+    take seconds to import.
+    """
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    from faster_whisper import WhisperModel
+    return WhisperModel
+
+def load_model(tier=FINAL_TIER):
+    """
+    Load (once) and return the Whisper model for a tier. With WHISPER_DEVICE
+    "auto", a model that fails to load or warm up on CUDA is loaded again on
+    the CPU with int8.
+    """
+    global faster_whisper_model, cuda_failed
+    name = model_name(tier)
+    with model_lock:
+        if name in models:
+            return models[name]
+        try:
+            import_start = time.perf_counter()
+            WhisperModel = import_whisper()
+            model_timings.setdefault('import', time.perf_counter() - import_start)
+        except Exception as e:
+            model_load_errors[tier] = e
+            print(f"[ERROR] Failed to import faster_whisper: {e}")
+            raise
+        device = resolve_device()
+        compute_type = resolve_compute_type(device)
+        print(f"Loading {tier} Whisper model {name} ({device}, {compute_type})...")
+        timings = model_timings.setdefault(tier, {})
+        while True:
+            try:
+                load_start = time.perf_counter()
+                model = WhisperModel(
+                    name,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=config.WHISPER_CPU_THREADS,
+                    num_workers=config.WHISPER_NUM_WORKERS
+                )
+                timings['load'] = time.perf_counter() - load_start
+                if config.WHISPER_WARMUP:
+                    warmup_start = time.perf_counter()
+                    warm_up_model(model)
+                    timings['warmup'] = time.perf_counter() - warmup_start
+                break
+            except Exception as e:
+                if config.WHISPER_DEVICE == "auto" and device == "cuda":
+                    print(f"[WARNING] Could not load {tier} Whisper model on CUDA ({e}), falling back to CPU (int8).")
+                    cuda_failed = True
+                    device, compute_type = "cpu", "int8"
+                    continue
+                model_load_errors[tier] = e
+                print(f"[ERROR] Failed to load {tier} Whisper model: {e}")
+                raise
+        models[name] = model
+        if name == config.WHISPER_MODEL:
+            faster_whisper_model = model
+            model_ready.set()
+        print(f"{tier.capitalize()} Whisper model ready {time.perf_counter() - startup_time:.2f}s after startup "
+              f"(load {timings['load']:.2f}s, warm-up {timings.get('warmup', 0):.2f}s)")
+        return model
+
+def load_model_async():
+    """
+    Load the models on a background thread, the small partial model first so
+    live feedback is available as early as possible.
+    """
+    def target():
+        for tier in (PARTIAL_TIER, FINAL_TIER):
+            try:
+                load_model(tier)
+            except Exception:
+                pass  # already reported, get_model() raises it again
+        models_loaded.set()
+    threading.Thread(target=target, daemon=True).start()
+
+def get_model(tier=FINAL_TIER):
+    """Return the model for a tier, waiting for a background load to finish."""
+    model = models.get(model_name(tier))
+    if model is None:
+        if tier in model_load_errors:
+            raise RuntimeError(f"Whisper model unavailable: {model_load_errors[tier]}")
+        return load_model(tier)
+    return model
+
+def report_first_transcript():
+    global first_transcript_reported
+    if not first_transcript_reported:
+        first_transcript_reported = True
+        print(f"Time to first transcript: {time.perf_counter() - startup_time:.2f}s after startup")
+
 # ---------------------------- Helper Functions ----------------------------
 
+def publish_transcript(text):
+    for listener in transcript_listeners:
+        listener(text)
+
+def publish_state(state):
+    for listener in state_listeners:
+        listener(state)
+
+def input_format():
+    """(sample rate, channels) to open the input device with."""
+    if not config.AUDIO_NATIVE_FORMAT:
+        return SAMPLE_RATE, CHANNELS
+    try:
+        if config.AUDIO_INPUT_DEVICE is None:
+            info = audio.get_default_input_device_info()
+        else:
+            info = audio.get_device_info_by_index(config.AUDIO_INPUT_DEVICE)
+        # More than two channels (e.g. PulseAudio's default device) add nothing for speech
+        return int(info['defaultSampleRate']), max(1, min(int(info['maxInputChannels']), 2))
+    except Exception as e:
+        print(f"[WARNING] Could not query the input device, asking for 16 kHz mono: {e}")
+        return SAMPLE_RATE, CHANNELS
+
+def open_input_stream(rate, channels):
+    """Open the input device; chunks last as long as SAMPLE_SIZE samples at 16 kHz."""
+    return audio.open(
+        format=FORMAT,
+        channels=channels,
+        rate=rate,
+        input=True,
+        input_device_index=config.AUDIO_INPUT_DEVICE,
+        frames_per_buffer=max(1, round(SAMPLE_SIZE * rate / SAMPLE_RATE)),
+        stream_callback=audio_callback
+    )
+
 def initialize_audio():
     global audio
+    if pyaudio is None:
+        raise RuntimeError("PyAudio is not installed, microphone capture is unavailable")
     if audio is None:
         audio = pyaudio.PyAudio()
 
@@ -47,35 +324,345 @@ def close_audio():
         audio.terminate()
         audio = None
 
-def int2float(sound):
-    abs_max = np.abs(sound).max()
-    sound = sound.astype('float32')
-    if abs_max > 0:
-        sound *= 1 / 32768
-    return sound.squeeze()
+def audio_seconds(samples):
+    return round(len(samples) / SAMPLE_RATE, 3)
+
+def transcribe_text(audio_buffer, prompt=None, vad_filter=True, tier=FINAL_TIER):
+    """Transcribe a buffer and return the plain text."""
+    transcription = ''
+    segments, _ = get_model(tier).transcribe(
+        audio_buffer,
+        task="transcribe",
+        language='en',
+        vad_filter = vad_filter,
+        without_timestamps=True,
+        initial_prompt=prompt or None
+    )
+    for segment in segments:
+        transcription += segment.text
+    return transcription
+
+def transcribe_segments(audio, prompt=None, tier=FINAL_TIER):
+    """Transcribe a buffer and return its (start, end, text) segments in seconds."""
+    segments, _ = get_model(tier).transcribe(
+        audio,
+        task="transcribe",
+        language='en',
+        vad_filter=True,
+        initial_prompt=prompt or None
+    )
+    return [(segment.start, segment.end, segment.text.strip()) for segment in segments]
+
+def transcribe_batch(windows, prompts=None, tier=FINAL_TIER):
+    """
+    Transcribe several windows (30 s at most each, e.g. from different
+    daemon clients) with one batched decoder call and return their texts.
+    Falls back to one transcribe() call per window if the installed
+    faster_whisper lacks the internals used for batching or the batched
+    call fails.
+    """
+    prompts = prompts or [None] * len(windows)
+    if len(windows) > 1:
+        try:
+            return decode_batch(get_model(tier), windows, prompts)
+        except (AttributeError, TypeError, ImportError, ValueError, RuntimeError) as e:
+            print(f"[WARNING] Batched decoding failed ({e}), decoding windows one by one.")
+    return [transcribe_text(window, prompt, vad_filter=False, tier=tier).strip()
+            for window, prompt in zip(windows, prompts)]
+
+def decode_batch(model, windows, prompts):
+    """Encode and decode a batch of windows directly on the CTranslate2 model."""
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+    tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language="en")
+    # How much silence the extractor appends differs between faster_whisper
+    # versions, so every window is padded or trimmed to 30 s (3000 frames)
+    features = np.stack([pad_or_trim(model.feature_extractor(window)) for window in windows])
+    encoder_output = model.encode(features)
+    prompt_tokens = []
+    for prompt in prompts:
+        previous = tokenizer.encode(' ' + prompt.strip())[-223:] if prompt else []
+        prompt_tokens.append(model.get_prompt(tokenizer, previous, without_timestamps=True))
+    results = model.model.generate(
+        encoder_output,
+        prompt_tokens,
+        beam_size=5,
+        max_length=448,
+        suppress_blank=True,
+        suppress_tokens=[-1]
+    )
+    return [tokenizer.decode(result.sequences_ids[0]).strip() for result in results]
 
 def transcribe_and_queue(audio_buffer):
     global final_transcription_text
 
     if len(audio_buffer) == 0:
-        transcription_queue.put("No audio data to transcribe.")
+        publish_transcript("No audio data to transcribe.")
         return ""
 
-    transcription = ''
-    segments, _ = faster_whisper_model.transcribe(
+    with tracer.span("stt.full_pass", audio_s=audio_seconds(audio_buffer)):
+        transcription = transcribe_text(audio_buffer)
+    report_first_transcript()
+    publish_transcript(transcription)
+    final_transcription_text = transcription
+    return transcription
+
+def transcribe_words(audio_buffer, prompt=None, vad_filter=True):
+    """
+    Transcribe a window with the partial-tier model and return the recognized
+    words with timestamps. Stops early if the scheduler cancels the pass.
+    """
+    segments, _ = get_model(PARTIAL_TIER).transcribe(
         audio_buffer,
         task="transcribe",
         language='en',
-        vad_filter = True,
-        without_timestamps=True
+        vad_filter=vad_filter,
+        word_timestamps=True,
+        initial_prompt=prompt or None
     )
+    words = []
     for segment in segments:
-        transcription += segment.text
+        if scheduler.partial_cancelled.is_set():
+            break
+        words.extend(segment.words or [])
+    return words
+
+def speech_window(start, end):
+    """
+    Audio of [start, end) to feed the decoder, plus the (offset, absolute
+    start) chunk map that turns decoder timestamps back into sample positions.
+    """
+    start = max(start, audio_buffer.start)
+    if not VAD_PREFILTER:
+        return audio_buffer.float_window(start, end), [(0, start)]
+
+    parts, chunks, offset = [], [], 0
+    for region_start, region_end in voice_activity.speech_regions(start, end):
+        parts.append(audio_buffer.float_window(region_start, region_end))
+        chunks.append((offset, region_start))
+        offset += len(parts[-1])
+    if not parts:
+        return np.zeros(0, dtype=np.float32), []
+    return np.concatenate(parts), chunks
+
+def to_absolute(seconds, chunks):
+    """Map a decoder timestamp in a speech_window back to a sample index."""
+    position = int(seconds * SAMPLE_RATE)
+    offset, start = chunks[0]
+    for chunk_offset, chunk_start in chunks:
+        if chunk_offset > position:
+            break
+        offset, start = chunk_offset, chunk_start
+    return start + position - offset
+
+def transcribe_stream_pass():
+    """
+    Decode only the uncommitted tail of audio_buffer and publish the
+    committed + tentative transcript.
+    """
+    global final_transcription_text
 
-    transcription_queue.put(transcription)
+    voiced_samples = voice_activity.voiced_samples
+    window_start = max(streamer.committed_until, audio_buffer.start)
+    window_end = audio_buffer.end
+    if window_end <= window_start:
+        return streamer.text
+
+    window, chunks = speech_window(window_start, window_end)
+    if len(window) > 0:
+        with tracer.span("stt.partial_pass", audio_s=audio_seconds(window)) as span:
+            words = transcribe_words(window, prompt=transcript_context(), vad_filter=not VAD_PREFILTER)
+            span['cancelled'] = scheduler.partial_cancelled.is_set()
+        if scheduler.partial_cancelled.is_set():
+            return streamer.text
+        capture_stats['completed_passes'] += 1
+        words = [(w.word, to_absolute(w.start, chunks), to_absolute(w.end, chunks)) for w in words]
+        streamer.update(words, window_end)
+    streamer.voiced_at_pass = voiced_samples
+
+    transcription = transcript_text()
+    report_first_transcript()
+    publish_transcript(transcription)
     final_transcription_text = transcription
     return transcription
 
+def transcript_text():
+    """Finished segments followed by the live text of the open segment."""
+    return ' '.join(finished_segments + [streamer.text]).strip()
+
+def transcript_context():
+    """Committed text preceding the open window, used as the decoder prompt."""
+    committed = ' '.join(finished_segments + [streamer.committed_text.strip()])
+    return committed.strip()[-STREAM_PROMPT_CHARS:]
+
+def pause_passes_enabled():
+    return INCREMENTAL_FINAL_PASS and model_name(PARTIAL_TIER) != model_name(FINAL_TIER)
+
+def final_tail(end, stop=False):
+    """
+    Final-model text of the open segment's audio between the last pause pass
+    and `end` (nothing if that audio holds no speech, e.g. just the padding
+    around the words before the last pause).
+    """
+    start = max(final_prefix_until, open_segment_start)
+    if end <= start or not voice_activity.has_speech(start, end):
+        return ''
+    window, _ = speech_window(start, end)
+    if len(window) == 0:
+        return ''
+    capture_stats['final_decoded_seconds' if stop else 'pause_decoded_seconds'] += len(window) / SAMPLE_RATE
+    prompt = ' '.join(finished_segments + [final_prefix_text]).strip()[-STREAM_PROMPT_CHARS:]
+    with tracer.span("stt.final_tail", audio_s=audio_seconds(window)):
+        return transcribe_text(window, prompt=prompt, vad_filter=not VAD_PREFILTER, tier=FINAL_TIER).strip()
+
+def pause_pass(pause_end):
+    """Scheduler job: decode the open segment up to a pause with the final model."""
+    global final_prefix_text, final_prefix_until
+    if pause_end <= max(final_prefix_until, open_segment_start):
+        return  # the segment was closed in the meantime
+    tail = final_tail(pause_end)
+    capture_stats['pause_passes'] += 1
+    final_prefix_text = ' '.join(part for part in (final_prefix_text, tail) if part)
+    final_prefix_until = pause_end
+
+def reset_final_prefix(start=0):
+    global final_prefix_text, final_prefix_until
+    final_prefix_text = ''
+    final_prefix_until = start
+
+def incremental_final_text():
+    """
+    Final text of the open segment, built on the partial passes: their text
+    is reused as is when no speech arrived since the last pass, otherwise
+    only the audio after the last committed word is decoded and appended.
+    When the partial passes run a different (smaller) model, the pause
+    passes' final-model text is reused and only the audio after the last
+    pause is decoded.
+    """
+    if pause_passes_enabled():
+        tail = final_tail(audio_buffer.end, stop=True)
+        return ' '.join(part for part in (final_prefix_text, tail) if part)
+
+    if streamer.voiced_at_pass == voice_activity.voiced_samples:
+        capture_stats['final_reused'] += 1
+        return streamer.text
+
+    tail_start = max(streamer.committed_until, open_segment_start)
+    window, _ = speech_window(tail_start, audio_buffer.end)
+    tail = ''
+    if len(window) > 0:
+        capture_stats['final_decoded_seconds'] += len(window) / SAMPLE_RATE
+        with tracer.span("stt.final_tail", audio_s=audio_seconds(window)):
+            tail = transcribe_text(window, prompt=transcript_context(), vad_filter=not VAD_PREFILTER)
+    return ' '.join(part for part in (streamer.committed_text.strip(), tail.strip()) if part)
+
+def finish_segment(segment_end, has_speech, text=None):
+    """
+    Transcribe a closed segment (unless its text is given), append its text
+    and release its audio.
+    """
+    global open_segment_start
+
+    if text is not None:
+        if text:
+            finished_segments.append(text)
+    elif has_speech and pause_passes_enabled():
+        # The pause passes already decoded the start of the segment
+        text = ' '.join(part for part in (final_prefix_text, final_tail(segment_end)) if part)
+        if text:
+            finished_segments.append(text)
+    elif has_speech and segment_end > open_segment_start:
+        window, _ = speech_window(open_segment_start, segment_end)
+        if len(window) > 0:
+            prompt = ' '.join(finished_segments)[-STREAM_PROMPT_CHARS:]
+            with tracer.span("stt.segment_pass", audio_s=audio_seconds(window)):
+                text = transcribe_text(window, prompt=prompt, vad_filter=not VAD_PREFILTER).strip()
+            if text:
+                finished_segments.append(text)
+    capture_stats['segments'] += 1
+
+    open_segment_start = segment_end
+    reset_final_prefix(segment_end)
+    audio_buffer.discard_until(segment_end)
+    voice_activity.discard_until(segment_end)
+    streamer.reset(start=segment_end)
+
+def reset_segments():
+    global open_segment_start
+    open_segment_start = 0
+    finished_segments.clear()
+    segmenter.reset()
+    pause_segmenter.reset()
+    reset_final_prefix()
+
+# ---------------------------- Streaming Transcript ----------------------------
+
+def _normalize_word(word):
+    return ''.join(ch for ch in word.lower() if ch.isalnum())
+
+class LocalAgreement:
+    """
+    Local-agreement commit policy for streaming transcription.
+
+    Words are committed once two consecutive passes agree on them. Committed
+    words are never revised, and the next pass only needs to decode audio
+    after the end of the last committed word.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.reset()
+
+    def reset(self, start=0):
+        self.committed_words = []
+        self.committed_until = start    # absolute sample index
+        self.hypothesis = []        # (text, start, end) from the previous pass
+        self.voiced_at_pass = None  # VAD voiced-sample count when the last pass ran
+
+    @property
+    def committed_text(self):
+        return ''.join(word for word, _, _ in self.committed_words)
+
+    @property
+    def tentative_text(self):
+        return ''.join(word for word, _, _ in self.hypothesis)
+
+    @property
+    def text(self):
+        return (self.committed_text + self.tentative_text).strip()
+
+    def update(self, current, window_end):
+        """
+        Merge the (text, start, end) words of a pass over the audio up to
+        window_end and commit the prefix it shares with the previous pass.
+        """
+        agreed = 0
+        for (new_word, _, _), (old_word, _, _) in zip(current, self.hypothesis):
+            if _normalize_word(new_word) != _normalize_word(old_word):
+                break
+            agreed += 1
+
+        # Never let the window grow without bound: commit everything but the
+        # last few seconds if the passes keep disagreeing.
+        if (window_end - self.committed_until) / self.sample_rate > STREAM_MAX_WINDOW:
+            keep_from = window_end - int(STREAM_KEEP_TAIL * self.sample_rate)
+            while agreed < len(current) and current[agreed][2] <= keep_from:
+                agreed += 1
+
+        self._commit(current[:agreed])
+        self.hypothesis = current[agreed:]
+
+    def commit_all(self):
+        """Commit the pending hypothesis (used when the recording ends)."""
+        self._commit(self.hypothesis)
+        self.hypothesis = []
+
+    def _commit(self, words):
+        if words:
+            self.committed_words.extend(words)
+            self.committed_until = max(self.committed_until, words[-1][2])
+
+streamer = LocalAgreement()
+
 
 # ---------------------------- State Management Functions ----------------------------
 
@@ -86,8 +673,7 @@ def set_recording_state():
     cumulative_transcription_time = 0
 
     # Change the border color back to white when recording stops
-    if window:
-        window.change_border_color("#EEEEEE")
+    publish_state(WINDOW_ACTIVE)
 
 
 def reset_recording_state():
@@ -97,98 +683,126 @@ def reset_recording_state():
     start_transcription_time = 0
 
     # Change the border color back to white when recording stops
-    if window:
-        window.change_border_color("#EEEEEE")
-
-# ---------------------------- PyQt Floating Window ----------------------------
-
-class FloatingWindow(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Transcription")
-        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
-        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
-        self.setWindowOpacity(0.8)
-        self.setGeometry(1600, 200, 800, 300)
-
-        # Define the initial color used for the text and the border
-        self.text_color = "#EEEEEE"
-        self.border_color = self.text_color
-
-        # Create the QLabel with the updated style sheet
-        self.label = QLabel("Start speaking...", self)
-        self.update_label_style()
-        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.label.setWordWrap(True)
-        self.label.setFixedSize(800, 300)
-
-        # Timer for updating the transcription text
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_transcription)
-        self.timer.start(100)
-
-    def update_label_style(self):
-        """Update the style sheet of the QLabel."""
-        self.label.setStyleSheet(
-            f"""
-            color: {self.text_color};
-            background-color: #222222;
-            font-size: 22px;
-            padding: 20px;
-            border: 4px solid {self.border_color};
-            """
-        )
-
-    def change_border_color(self, color: str):
-        """Change the color of the border."""
-        self.border_color = color
-        self.update_label_style()
-
-    def update_transcription(self):
-        global continue_recording
-        if cumulative_transcription_time >= recording_time_limit:
-            continue_recording = False
-        try:
-            while True:
-                transcription = transcription_queue.get_nowait()
-                self.label.setText(transcription)
-        except queue.Empty:
-            pass
-        except Exception as e:
-            print(f"[ERROR] Exception in update_transcription: {e}")
-
-    def closeEvent(self, event):
-        """
-        Override the close event to ensure transcription stops when the window is closed.
-        """
-        from main import stt_module  # Avoid circular import
-        stt_module.stop_record_and_transcription()
-        event.accept()
+    publish_state(WINDOW_ACTIVE)
 
 # ---------------------------- Recording and Control ----------------------------
 
+def reset_capture_stats():
+    capture_stats.update(
+        overflows=0,          # PortAudio reported an input overflow
+        dropped_chunks=0,     # audio_queue was full, chunk discarded
+        captured_samples=0,
+        segments=0,
+        idle_ticks=0,         # no new speech, partial pass not requested
+        requested_passes=0,
+        completed_passes=0,
+        skipped_passes=0,     # coalesced into a newer pass
+        final_reused=0,       # stop pass reused the last partial result
+        pause_passes=0,       # final-model passes run at pauses
+        pause_decoded_seconds=0.0,
+        final_decoded_seconds=0.0
+    )
+
+reset_capture_stats()
+
+def audio_callback(in_data, frame_count, time_info, status):
+    """PyAudio callback: runs on the PortAudio thread, so it only enqueues."""
+    if status & pyaudio.paInputOverflow:
+        capture_stats['overflows'] += 1
+    try:
+        audio_queue.put_nowait(in_data)
+    except queue.Full:
+        capture_stats['dropped_chunks'] += 1
+    return (None, pyaudio.paContinue)
+
+def drain_audio_queue(timeout=None):
+    """Move queued chunks into audio_buffer. Returns the number of chunks moved."""
+    moved = 0
+    try:
+        audio_chunk = audio_queue.get(timeout=timeout) if timeout else audio_queue.get_nowait()
+        while True:
+            audio_int16 = capture_resampler.process(np.frombuffer(audio_chunk, dtype=np.int16))
+            audio_buffer.write(audio_int16)
+            capture_stats['captured_samples'] += len(audio_int16)
+            frames = voice_activity.process(audio_int16)
+            if LONG_FORM_DICTATION:
+                for segment_end, has_speech in segmenter.process(frames):
+                    scheduler.submit_final(finish_segment, segment_end, has_speech)
+                    request_pass()
+                    pause_segmenter.reset(start=segment_end)
+            if pause_passes_enabled():
+                for pause_end, has_speech in pause_segmenter.process(
+                        [frame for frame in frames if frame[0] >= pause_segmenter.segment_start]):
+                    if has_speech:
+                        scheduler.submit_final(pause_pass, pause_end)
+                        request_pass()
+            moved += 1
+            audio_chunk = audio_queue.get_nowait()
+    except queue.Empty:
+        pass
+    return moved
+
+def request_pass():
+    """
+    Queue a partial pass. A pass that is still waiting is replaced, so the
+    scheduler always decodes the newest audio.
+    """
+    capture_stats['requested_passes'] += 1
+    if scheduler.submit_partial(transcribe_stream_pass):
+        capture_stats['skipped_passes'] += 1
+
+def finish_recording():
+    """Final pass over whatever the partial and segment passes left open."""
+    global final_transcription_text
+    if INCREMENTAL_FINAL_PASS:
+        text = incremental_final_text()
+        if LONG_FORM_DICTATION:
+            finish_segment(audio_buffer.end, has_speech=True, text=text)
+            text = ' '.join(finished_segments)
+        final_transcription_text = text
+        publish_transcript(final_transcription_text)
+    elif LONG_FORM_DICTATION:
+        finish_segment(audio_buffer.end, has_speech=True)
+        final_transcription_text = ' '.join(finished_segments)
+        publish_transcript(final_transcription_text)
+    elif len(audio_buffer) > 0:
+        transcribe_and_queue(audio_buffer.float_window())
+    return final_transcription_text
+
 def start_recording():
-    global continue_recording, cumulative_transcription_time, start_transcription_time
+    global continue_recording, cumulative_transcription_time, start_transcription_time, capture_resampler
+    global final_transcription_text
     start_transcription_time = time.time()
 
     initialize_audio()
     continue_recording = True
 
+    rate, channels = input_format()
     try:
-        stream = audio.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=SAMPLE_RATE,
-            input=True,
-            frames_per_buffer=CHUNK
-        )
+        try:
+            stream = open_input_stream(rate, channels)
+        except Exception as e:
+            if (rate, channels) == (SAMPLE_RATE, CHANNELS):
+                raise
+            print(f"[WARNING] Could not open the input at {rate} Hz x {channels}, asking for 16 kHz mono: {e}")
+            rate, channels = SAMPLE_RATE, CHANNELS
+            stream = open_input_stream(rate, channels)
     except Exception as e:
         print(f"Error opening audio stream: {e}")
         close_audio()
         return
-
-    audio_data = []
+    if (rate, channels) != (capture_resampler.in_rate, capture_resampler.channels):
+        capture_resampler = StreamingResampler(rate, SAMPLE_RATE, channels)
+        print(f"Capturing at {rate} Hz x {channels}, converted to {SAMPLE_RATE} Hz mono.")
+    capture_resampler.reset()
+
+    audio_buffer.reset()
+    streamer.reset()
+    voice_activity.reset()
+    reset_segments()
+    reset_capture_stats()
     last_transcription_time = time.time()
+    voiced_at_last_pass = 0
 
     print("Recording started. Speak into the microphone...")
     start_transcription_time = time.time()
@@ -196,16 +810,18 @@ def start_recording():
     try:
         while continue_recording:
             if stream.is_active():
-                audio_chunk = stream.read(SAMPLE_SIZE, exception_on_overflow=False)
-                audio_int16 = np.frombuffer(audio_chunk, dtype=np.int16)
-                audio_float32 = int2float(audio_int16)
-                audio_data.append(audio_float32)
+                drain_audio_queue(timeout=0.1)
 
                 current_time = time.time()
                 cumulative_transcription_time = current_time - start_transcription_time
+                if not LONG_FORM_DICTATION and cumulative_transcription_time >= recording_time_limit:
+                    continue_recording = False
                 if current_time - last_transcription_time >= 1.0:
-                    cumulative_audio = np.concatenate(audio_data, axis=0)
-                    transcribe_and_queue(cumulative_audio)
+                    if voice_activity.voiced_samples > voiced_at_last_pass:
+                        voiced_at_last_pass = voice_activity.voiced_samples
+                        request_pass()
+                    else:
+                        capture_stats['idle_ticks'] += 1
                     last_transcription_time = current_time
             else:
                 time.sleep(0.1)
@@ -215,29 +831,49 @@ def start_recording():
         stream.stop_stream()
         stream.close()
         close_audio()
-
-        if len(audio_data) > 0:
-            final_audio = np.concatenate(audio_data, axis=0)
-            transcribe_and_queue(final_audio)
+        drain_audio_queue()
+
+        # The final pass runs ahead of (and cancels) any partial work.
+        scheduler.cancel_partials()
+        if skip_final_pass:
+            final_transcription_text = ''
+            print("Final pass skipped (utterance cancelled).")
+        else:
+            final_start = time.perf_counter()
+            try:
+                with tracer.span("stt.final", recorded_s=round(capture_stats['captured_samples'] / SAMPLE_RATE, 2)):
+                    scheduler.submit_final(finish_recording).result()
+            except Exception as e:
+                print(f"[ERROR] Final transcription failed: {e}")
+            print(f"Final pass took {time.perf_counter() - final_start:.2f}s")
+        print('Capture stats:', capture_stats)
+        print('Scheduler stats:', scheduler.stats)
+        if audio_buffer.overwritten:
+            print(f"[WARNING] {audio_buffer.overwritten} samples were overwritten before transcription.")
         stop_event.set()
         print("Recording stopped and final transcription completed.")
         print('Final transcription:', final_transcription_text)
-        if window:
-            window.change_border_color("#AA0000")
+        publish_state(WINDOW_DONE)
 
 
 def start_record_and_transcription():
-    global recording_thread, start_transcription_time, continue_recording
+    global recording_thread, start_transcription_time, continue_recording, skip_final_pass
 
     stop_event.clear()
+    skip_final_pass = False
     initialize_audio()
     set_recording_state()
+    if not model_ready.is_set():
+        publish_transcript("Loading speech model...")
 
     # Start the recording thread
     recording_thread = threading.Thread(target=start_recording, daemon=True)
     recording_thread.start()
 
-def stop_record_and_transcription():
+def stop_record_and_transcription(final_pass=True):
+    """Stop recording and wait for the final pass (skipped with final_pass=False)."""
+    global skip_final_pass
+    skip_final_pass = not final_pass
     reset_recording_state()
     stop_event.set()
 
@@ -257,4 +893,10 @@ window = None
 def init_window():
     global window
     if window is None:
+        from floating_window import FloatingWindow  # PyQt is only needed with the window
         window = FloatingWindow()
+
+if __name__ == "__main__":
+    # python -m stt_module transcribe DIR: batch transcription of audio files
+    from batch_transcribe import main
+    main()
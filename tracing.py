@@ -0,0 +1,181 @@
+# tracing.py
+#
+# Per-stage latency tracing. Spans are appended as JSON lines to a rotating
+# file; `python tracing.py summary` reports p50/p95/p99 per stage.
+
+import argparse
+import atexit
+import contextlib
+import itertools
+import json
+import math
+import os
+import queue
+import threading
+import time
+import config
+
+class Tracer:
+    """
+    Records timing spans ({"ts", "trace", "stage", "ms", ...fields}) to a
+    JSONL file, rotated to path.1 ... path.<backups> once it grows past
+    `max_bytes`. Spans are written by a background thread, so recording one
+    costs a queue put. All spans of one utterance share the trace id set by
+    start_trace().
+    """
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3, enabled=True):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = enabled
+        self.trace_id = None
+        self._ids = itertools.count(1)
+        self._queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def start_trace(self):
+        """Start a new trace (one utterance) and return its id."""
+        self.trace_id = f"{int(time.time())}-{next(self._ids)}"
+        return self.trace_id
+
+    @contextlib.contextmanager
+    def span(self, stage, **fields):
+        """
+        Time the enclosed block. Fields can be added to the yielded dict; with
+        an `audio_s` field the real-time factor is recorded too.
+        """
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException:
+            fields['error'] = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if fields.get('audio_s'):
+                fields['rtf'] = round(elapsed / fields['audio_s'], 3)
+            self.record(stage, elapsed, **fields)
+
+    def record(self, stage, seconds, **fields):
+        """Record a span measured elsewhere (`seconds` long)."""
+        if not self.enabled or seconds is None:
+            return
+        entry = {"ts": round(time.time(), 3), "trace": self.trace_id, "stage": stage,
+                 "ms": round(seconds * 1000, 2)}
+        entry.update(fields)
+        self._ensure_writer()
+        self._queue.put(entry)
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="tracer", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.close)
+
+    def _write_loop(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            f = open(self.path, 'a', encoding='utf-8')
+        except OSError as e:
+            print(f"[ERROR] Tracing disabled, cannot open {self.path}: {e}")
+            self.enabled = False
+            return
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            f.write(json.dumps(entry) + '\n')
+            if f.tell() > self.max_bytes:
+                f.close()
+                self._rotate()
+                f = open(self.path, 'a', encoding='utf-8')
+            elif self._queue.empty():
+                f.flush()
+        f.close()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1" if self.backups else self.path + '.old')
+
+    def close(self):
+        """Flush the pending spans (called at exit)."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=2)
+
+tracer = Tracer(
+    config.TRACE_PATH,
+    max_bytes=config.TRACE_MAX_BYTES,
+    backups=config.TRACE_BACKUPS,
+    enabled=config.TRACING
+)
+
+# ---------------------------- Summary ----------------------------
+
+def trace_files(path):
+    """The trace file and its rotated backups, oldest first."""
+    path = os.path.expanduser(path)
+    backups = sorted((p for p in (f"{path}.{i}" for i in range(1, 100)) if os.path.exists(p)),
+                     key=lambda p: int(p.rsplit('.', 1)[1]), reverse=True)
+    return backups + ([path] if os.path.exists(path) else [])
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+def summarize(paths, since=None):
+    """Per-stage duration (and real-time factor where recorded) percentiles."""
+    durations, rtfs = {}, {}
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                if since is not None and entry.get("ts", 0) < since:
+                    continue
+                durations.setdefault(entry["stage"], []).append(entry["ms"])
+                if entry.get("rtf") is not None:
+                    rtfs.setdefault(entry["stage"], []).append(entry["rtf"])
+    rows = []
+    for stage in sorted(durations):
+        values = sorted(durations[stage])
+        row = {"stage": stage, "n": len(values),
+               "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+        if stage in rtfs:
+            stage_rtfs = sorted(rtfs[stage])
+            row["rtf_p50"] = percentile(stage_rtfs, 50)
+            row["rtf_p95"] = percentile(stage_rtfs, 95)
+        rows.append(row)
+    return rows
+
+def print_summary(rows):
+    print(f"{'stage':<22} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RTF p50':>8} {'RTF p95':>8}")
+    for row in rows:
+        rtf = (f" {row['rtf_p50']:>8.3f} {row['rtf_p95']:>8.3f}" if 'rtf_p50' in row else '')
+        print(f"{row['stage']:<22} {row['n']:>6} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}{rtf}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline latency traces")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    summary = subcommands.add_parser("summary", help="p50/p95/p99 per stage")
+    summary.add_argument("--path", default=config.TRACE_PATH, help="trace file (rotated backups are included)")
+    summary.add_argument("--hours", type=float, help="only spans from the last N hours")
+    args = parser.parse_args()
+
+    paths = trace_files(args.path)
+    if not paths:
+        print(f"No traces found at {args.path}")
+        return
+    since = time.time() - args.hours * 3600 if args.hours else None
+    print_summary(summarize(paths, since))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# vad.py
+
+import collections
+import threading
+import numpy as np
+
+class EnergyVAD:
+    """
+    Incremental energy-based voice activity detection.
+
+    Audio is processed in fixed-size frames as it arrives. A frame is voiced
+    when its level is clearly above an adaptive noise floor, which follows
+    quiet frames quickly and loud ones slowly.
+    """
+    def __init__(self, frame_size=512, threshold_db=10.0, min_level_db=-50.0, floor_rise=0.01):
+        self.frame_size = frame_size
+        self.threshold_db = threshold_db
+        self.min_level_db = min_level_db
+        self.floor_rise = floor_rise
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = -70.0
+        self._pending = np.zeros(0, dtype=np.int16)
+
+    def process(self, samples):
+        """Return a list of (level_db, is_speech) for every complete frame."""
+        samples = np.concatenate((self._pending, np.asarray(samples, dtype=np.int16).reshape(-1)))
+        n_frames = len(samples) // self.frame_size
+        self._pending = samples[n_frames * self.frame_size:]
+        if n_frames == 0:
+            return []
+
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768
+        levels = 20 * np.log10(rms + 1e-10)
+
+        results = []
+        for level in levels:
+            level = float(level)
+            is_speech = level > max(self.noise_floor + self.threshold_db, self.min_level_db)
+            if level < self.noise_floor:
+                self.noise_floor = level
+            else:
+                self.noise_floor += self.floor_rise * (level - self.noise_floor)
+            results.append((level, is_speech))
+        return results
+
+class StreamingVAD:
+    """
+    Per-frame speech state of a live stream, in absolute sample positions.
+
+    Keeps the voiced regions seen so far, so a decoder can be fed only the
+    speech inside a window without running VAD over it again.
+    """
+    def __init__(self, vad, sample_rate=16000, speech_pad=0.4):
+        self.vad = vad
+        self.speech_pad = int(speech_pad * sample_rate)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, start=0):
+        with self._lock:
+            self.vad.reset()
+            self.position = start
+            self.voiced_samples = 0     # running total, used to detect new speech
+            self.regions = []           # [start, end] of voiced frames, unpadded
+
+    def process(self, samples):
+        """Return (start, end, level_db, is_speech) for every complete frame."""
+        frames = []
+        for level, is_speech in self.vad.process(samples):
+            start = self.position
+            end = start + self.vad.frame_size
+            if is_speech:
+                self.voiced_samples += end - start
+                with self._lock:
+                    if self.regions and start - self.regions[-1][1] <= 2 * self.speech_pad:
+                        self.regions[-1][1] = end
+                    else:
+                        self.regions.append([start, end])
+            self.position = end
+            frames.append((start, end, level, is_speech))
+        return frames
+
+    def speech_regions(self, start, end):
+        """Padded voiced regions clipped to [start, end)."""
+        with self._lock:
+            voiced = [tuple(region) for region in self.regions]
+        regions = []
+        for region_start, region_end in voiced:
+            region_start = max(region_start - self.speech_pad, start)
+            region_end = min(region_end + self.speech_pad, end)
+            if region_end <= region_start:
+                continue
+            if regions and region_start <= regions[-1][1]:
+                regions[-1][1] = max(regions[-1][1], region_end)
+            else:
+                regions.append([region_start, region_end])
+        return regions
+
+    def has_speech(self, start, end):
+        """True if any voiced frame (without padding) lies in [start, end)."""
+        with self._lock:
+            return any(region_start < end and region_end > start for region_start, region_end in self.regions)
+
+    def discard_until(self, index):
+        """Forget regions that end before the absolute index `index`."""
+        with self._lock:
+            self.regions = [region for region in self.regions if region[1] + self.speech_pad > index]
+
+class PauseSegmenter:
+    """
+    Split a live stream into independent segments at pauses in speech.
+
+    `process` takes the frames produced by StreamingVAD and returns the
+    segment boundaries found in them as (absolute sample index, segment
+    contained speech) tuples. Segments that run past `max_segment` seconds
+    are cut at the quietest recent frame.
+    """
+    def __init__(self, sample_rate=16000, frame_size=512, min_pause=0.6, min_segment=2.0, max_segment=25.0):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.min_pause = int(min_pause * sample_rate)
+        self.min_segment = int(min_segment * sample_rate)
+        self.max_segment = int(max_segment * sample_rate)
+        self.reset()
+
+    def reset(self, start=0):
+        self.position = start
+        self.segment_start = start
+        self.segment_has_speech = False
+        self.silence_start = None
+        self.recent_levels = collections.deque(maxlen=int(2 * self.sample_rate / self.frame_size))
+
+    def process(self, frames):
+        boundaries = []
+        for frame_start, frame_end, level, is_speech in frames:
+            self.recent_levels.append((level, frame_end))
+
+            if is_speech:
+                self.segment_has_speech = True
+                self.silence_start = None
+            elif self.silence_start is None:
+                self.silence_start = frame_start
+            self.position = frame_end
+
+            if (self.segment_has_speech and self.silence_start is not None
+                    and self.position - self.silence_start >= self.min_pause
+                    and self.silence_start - self.segment_start >= self.min_segment):
+                # Cut in the middle of the pause so both sides keep some context.
+                boundaries.append(self._close((self.silence_start + self.position) // 2))
+            elif self.position - self.segment_start >= self.max_segment:
+                _, quietest_end = min(self.recent_levels)
+                boundaries.append(self._close(quietest_end))
+        return boundaries
+
+    def _close(self, boundary):
+        boundary = max(boundary, self.segment_start + 1)
+        closed = (boundary, self.segment_has_speech)
+        self.segment_start = boundary
+        # A forced cut can land mid-utterance; the new segment then already
+        # holds speech.
+        self.segment_has_speech = self.silence_start is None
+        if self.silence_start is not None:
+            self.silence_start = max(self.silence_start, boundary)
+        return closed